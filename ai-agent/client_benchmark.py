@@ -0,0 +1,126 @@
+"""Per-request overhead of toolbox calls: a client and ID token per request vs. shared ones.
+
+"per request" repeats what every tool call used to do: fetch an ID token
+from the metadata server, open a new toolbox client, load the tool, call
+it and close the client. "shared" is the current path: one
+`ToolboxConnection` whose tools are loaded once, authorized by an
+`IdTokenCache`. A stand-in metadata server runs in-process; run it
+against a running toolbox, e.g. the load test's stand-in:
+
+    MCP_TOOLBOX_SERVICE_URL=http://localhost:5000 python client_benchmark.py
+
+The toolbox call itself is included in both columns, so with a local
+toolbox the difference is the overhead removed per request.
+"""
+import asyncio
+import base64
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from google.auth.transport.requests import Request
+from google.oauth2 import id_token
+from toolbox_core import ToolboxClient
+
+# Import the helpers without corporate_agent/__init__.py, which builds the agent
+package = types.ModuleType("corporate_agent")
+package.__path__ = [str(Path(__file__).resolve().parent / "corporate_agent")]
+sys.modules.setdefault("corporate_agent", package)
+
+from corporate_agent.auth import IdTokenCache  # noqa: E402
+from corporate_agent.toolset import ToolboxConnection  # noqa: E402
+
+MCP_TOOLBOX_SERVICE_URL = os.getenv("MCP_TOOLBOX_SERVICE_URL", "http://localhost:5000")
+SAMPLES = int(os.getenv("BENCHMARK_SAMPLES", "200"))
+TOOL = "get-data-version"
+
+
+def _encode(value: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b"=").decode()
+
+
+class MetadataHandler(BaseHTTPRequestHandler):
+    """Answers the metadata-server ping and identity requests with an unsigned token."""
+
+    def do_GET(self):
+        body, content_type = b"", "text/plain"
+        if "/identity" in self.path:
+            body = ".".join([_encode({"alg": "RS256", "typ": "JWT"}),
+                             _encode({"aud": MCP_TOOLBOX_SERVICE_URL, "exp": int(time.time()) + 3600}),
+                             "c2lnbmF0dXJl"]).encode()
+        elif "/service-accounts/default" in self.path:
+            body, content_type = json.dumps(
+                {"email": "benchmark@example.iam.gserviceaccount.com", "scopes": []}).encode(), \
+                "application/json"
+        self.send_response(200)
+        self.send_header("Metadata-Flavor", "Google")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metadata_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MetadataHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"127.0.0.1:{server.server_address[1]}"
+    # Read by google-auth when it first imports the metadata module
+    os.environ["GCE_METADATA_HOST"] = os.environ["GCE_METADATA_IP"] = host
+    os.environ.pop("GOOGLE_APPLICATION_CREDENTIALS", None)
+    return server
+
+
+async def per_request() -> float:
+    started = time.perf_counter()
+    token = await asyncio.to_thread(id_token.fetch_id_token, Request(), MCP_TOOLBOX_SERVICE_URL)
+    client = ToolboxClient(MCP_TOOLBOX_SERVICE_URL,
+                           client_headers={"Authorization": f"Bearer {token}"})
+    try:
+        tool = await client.load_tool(TOOL)
+        await tool()
+    finally:
+        await client.close()
+    return (time.perf_counter() - started) * 1000
+
+
+async def shared(connection: ToolboxConnection) -> float:
+    started = time.perf_counter()
+    tool = await connection.load_tool(TOOL)
+    await tool()
+    return (time.perf_counter() - started) * 1000
+
+
+def report(label: str, samples: list[float]):
+    ordered = sorted(samples)
+    print(f"{label:<12} {statistics.median(ordered):>10.2f} {ordered[int(len(ordered) * 0.95)]:>10.2f} "
+          f"{statistics.mean(ordered):>10.2f}")
+
+
+async def main():
+    start_metadata_server()
+    connection = ToolboxConnection(
+        MCP_TOOLBOX_SERVICE_URL,
+        client_headers={"Authorization": IdTokenCache(MCP_TOOLBOX_SERVICE_URL).abearer})
+    # Warm both paths: imports, the metadata probe and the first connection
+    await per_request()
+    await shared(connection)
+    before = [await per_request() for _ in range(SAMPLES)]
+    after = [await shared(connection) for _ in range(SAMPLES)]
+    await connection.close()
+    print(f"{SAMPLES} calls of {TOOL} against {MCP_TOOLBOX_SERVICE_URL}")
+    print(f"{'client':<12} {'p50 ms':>10} {'p95 ms':>10} {'mean ms':>10}")
+    report("per request", before)
+    report("shared", after)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,9 +1,30 @@
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
 from google.adk.agents.llm_agent import Agent
+from google.adk.agents.readonly_context import ReadonlyContext
 from google.adk.agents.sequential_agent import SequentialAgent
+from google.adk.events.event import Event
+from google.adk.utils.context_utils import Aclosing
 from google.genai import types
-from toolbox_core import ToolboxSyncClient, auth_methods
+import logging
 import os
+import time
+from datetime import date
+from typing import AsyncGenerator, Optional
+from .auth import IdTokenCache
+from .metrics import (ERRORS, FAST_PRESENTER_RESPONSES, ROUTER_DECISIONS, TOOL_SECONDS, MetricsPlugin,
+                      cache_stats)
 from .models import FinalPresentation
+from .presenter import CHART_BUILDERS, build_presentation
+from .result_shaping import query_data_document, shape_results
+from .cache import DataVersion
+from .response_cache import ResponseCache, user_text
+from .router import QuestionRouter, question_fingerprint
+from .schema import SchemaCatalog
+from .session_results import SessionResults, is_follow_up, mentions_chart_form
+from .tool_cache import ToolResultCache
+from .tool_results import record_tool_result, reset_tool_results, store_tool_result, turn_tool_results
+from .toolset import SqlToolset, ToolboxConnection
 
 GEMINI_QUERY_ANALYST_MODEL_NAME = os.getenv(
     "GEMINI_QUERY_ANALYST_MODEL_NAME", "gemini-2.5-pro")
@@ -11,79 +32,355 @@ GEMINI_PRESENTER_MODEL_NAME = os.getenv(
     "GEMINI_PRESENTER_MODEL_NAME", "gemini-2.5-flash")
 COMPANY_NAME = os.getenv("COMPANY_NAME", "TechCorp")
 MCP_TOOLBOX_SERVICE_URL = os.getenv("MCP_TOOLBOX_SERVICE_URL")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_TTL_SECONDS = float(
+    os.getenv("RESPONSE_CACHE_TTL_SECONDS", "900"))
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+TOOL_CACHE_TTL_SECONDS = float(os.getenv("TOOL_CACHE_TTL_SECONDS", "300"))
+DATA_VERSION_CHECK_INTERVAL_SECONDS = float(
+    os.getenv("DATA_VERSION_CHECK_INTERVAL_SECONDS", "30"))
+SCHEMA_VERSION_CHECK_INTERVAL_SECONDS = float(
+    os.getenv("SCHEMA_VERSION_CHECK_INTERVAL_SECONDS", "300"))
+TOOL_CALL_CONCURRENCY = int(os.getenv("TOOL_CALL_CONCURRENCY", "8"))
+FAST_PRESENTER_ENABLED = os.getenv(
+    "FAST_PRESENTER_ENABLED", "True").lower() == "true"
+TOOL_RESULT_MAX_ROWS = int(os.getenv("TOOL_RESULT_MAX_ROWS", "50"))
+TOOL_RESULT_MAX_CHARS = int(os.getenv("TOOL_RESULT_MAX_CHARS", "8000"))
+QUERY_DATA_MAX_CHARS = int(os.getenv("QUERY_DATA_MAX_CHARS", "16000"))
+QUESTION_COALESCE_TIMEOUT_SECONDS = float(
+    os.getenv("QUESTION_COALESCE_TIMEOUT_SECONDS", "60"))
+# Optional snapshot of the toolset manifest to boot from (written after each successful load)
+TOOL_MANIFEST_PATH = os.getenv("TOOL_MANIFEST_PATH") or None
+TOOLSET_LOAD_ATTEMPTS = int(os.getenv("TOOLSET_LOAD_ATTEMPTS", "4"))
+TOOLSET_RETRY_BACKOFF_SECONDS = float(
+    os.getenv("TOOLSET_RETRY_BACKOFF_SECONDS", "0.5"))
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "True").lower() == "true"
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.75"))
+ROUTER_SIMILARITY_ENABLED = os.getenv(
+    "ROUTER_SIMILARITY_ENABLED", "True").lower() == "true"
+# Period used when a routed question names none ("who is our biggest customer?")
+ROUTER_DEFAULT_START_DATE = date.fromisoformat(
+    os.getenv("ROUTER_DEFAULT_START_DATE", "2000-01-01"))
+SESSION_RESULTS_ENABLED = os.getenv(
+    "SESSION_RESULTS_ENABLED", "True").lower() == "true"
+SESSION_RESULTS_MAX_ENTRIES = int(os.getenv("SESSION_RESULTS_MAX_ENTRIES", "8"))
+SESSION_RESULTS_TTL_SECONDS = float(
+    os.getenv("SESSION_RESULTS_TTL_SECONDS", "900"))
+
+logger = logging.getLogger(__name__)
 
 if not MCP_TOOLBOX_SERVICE_URL:
     raise ValueError(
         "MCP_TOOLBOX_SERVICE_URL environment variable is not set.")
 
 
-def get_toolbox_client():
-    """Get toolbox client with fresh authentication for each request."""
+def get_toolbox_connection():
+    """Create the shared toolbox connection; the client itself opens lazily."""
     if not MCP_TOOLBOX_SERVICE_URL:
         raise ValueError(
             "MCP_TOOLBOX_SERVICE_URL environment variable is required")
 
     if os.getenv("ENVIRONMENT") == "local":
         # Local development without authentication
-        return ToolboxSyncClient(url=MCP_TOOLBOX_SERVICE_URL)
-    # Use fresh auth token for each request (handles token expiration)
-    auth_token_provider = auth_methods.get_google_id_token(
-        MCP_TOOLBOX_SERVICE_URL)
-    return ToolboxSyncClient(
-        url=MCP_TOOLBOX_SERVICE_URL,
-        client_headers={"Authorization": auth_token_provider}
+        return ToolboxConnection(MCP_TOOLBOX_SERVICE_URL)
+    # ID tokens are cached and refreshed ahead of expiry
+    id_tokens = IdTokenCache(MCP_TOOLBOX_SERVICE_URL)
+    return ToolboxConnection(
+        MCP_TOOLBOX_SERVICE_URL,
+        client_headers={"Authorization": id_tokens.abearer}
     )
 
 
-def get_sql_toolset():
-    """Get SQL toolset with fresh toolbox client."""
-    toolbox = get_toolbox_client()
-    try:
-        return toolbox.load_toolset("ecommerce-toolset")
-    except Exception:
-        return []
+toolbox_connection = get_toolbox_connection()
+
+
+async def get_data_version():
+    """Fetch the change counters of the sales/customers/products tables."""
+    tool = await toolbox_connection.load_tool("get-data-version")
+    return await tool()
+
 
+async def get_schema_version():
+    """Fetch a hash of the public schema's tables and columns."""
+    tool = await toolbox_connection.load_tool("get-schema-version")
+    return await tool()
 
-# Initialize toolset
-sql_toolset = get_sql_toolset()
+
+async def list_tables():
+    """Fetch detailed schema information for every table."""
+    tool = await toolbox_connection.load_tool("list-tables")
+    return await tool(table_names="", output_format="detailed")
+
+
+# Schema changes far less often than the data; lookups may be re-run freely.
+TOOL_CACHE_TTL_OVERRIDES = {
+    "list-tables": 3600.0,
+    "search-products": 60.0,
+    "search-customers": 60.0,
+}
+
+data_version = DataVersion(get_data_version, DATA_VERSION_CHECK_INTERVAL_SECONDS)
+
+tool_cache = ToolResultCache(
+    max_entries=TOOL_CACHE_MAX_ENTRIES,
+    default_ttl_seconds=TOOL_CACHE_TTL_SECONDS,
+    tool_ttl_seconds=TOOL_CACHE_TTL_OVERRIDES,
+    data_version=data_version,
+)
+
+# How each tool orders its rows, which decides how an oversized result is cut:
+# ranked results keep their top rows plus an "Other" rollup, series are
+# summed into coarser periods or keep their latest rows.
+TOOL_ROW_ORDER = {
+    "get-monthly-sales-trend": "series",
+    "get-sales-by-category": "ranked",
+    "get-sales-by-region": "ranked",
+    "get-top-customers": "ranked",
+    "search-products": "ranked",
+    "search-customers": "ranked",
+}
+
+shape_result = shape_results(
+    max_rows=TOOL_RESULT_MAX_ROWS, max_chars=TOOL_RESULT_MAX_CHARS, row_order=TOOL_ROW_ORDER)
+
+# Loaded on the first model request (or /ready), inside the serving event loop,
+# from the manifest snapshot when one exists.
+# Results are shaped (columnar, capped) before they are cached or seen by the model.
+sql_toolset = SqlToolset(
+    toolbox_connection, "ecommerce-toolset",
+    wrap=lambda tool: tool_cache.wrap(shape_result(tool)),
+    max_concurrent_calls=TOOL_CALL_CONCURRENCY,
+    manifest_path=TOOL_MANIFEST_PATH,
+    load_attempts=TOOLSET_LOAD_ATTEMPTS,
+    retry_backoff_seconds=TOOLSET_RETRY_BACKOFF_SECONDS)
 
 STATE_QUERY_DATA = "sql_query_data"
 STATE_COMPLETION_PHRASE = "SQL_QUERY_COMPLETED"
 STATE_QUERY_CRITIQUE = "sql_query_critique"
+STATE_FINAL_PRESENTATION = "final_presentation"
 
-retriever_agent = Agent(
-    name="retriever_agent",
-    model=GEMINI_QUERY_ANALYST_MODEL_NAME,
-    tools=sql_toolset,  # type: ignore
-    description="""A Data Retriever agent capable of querying information from a corporate PostgreSQL database. It uses available tools perform the query.""",
-    instruction=f"""
+schema_catalog = SchemaCatalog(
+    list_tables,
+    schema_version=DataVersion(
+        get_schema_version, SCHEMA_VERSION_CHECK_INTERVAL_SECONDS),
+)
+
+question_router = QuestionRouter(
+    min_confidence=ROUTER_MIN_CONFIDENCE,
+    similarity=ROUTER_SIMILARITY_ENABLED,
+    default_start=ROUTER_DEFAULT_START_DATE,
+)
+
+session_results = SessionResults(
+    max_entries=SESSION_RESULTS_MAX_ENTRIES if SESSION_RESULTS_ENABLED else 0,
+    max_chars=TOOL_RESULT_MAX_CHARS,
+    ttl_seconds=SESSION_RESULTS_TTL_SECONDS,
+    data_version=data_version,
+)
+
+
+def question_key(question: str) -> str:
+    """Response cache key: the tool call for routed questions answered from a chart template."""
+    today = date.today()
+    route = None
+    if ROUTER_ENABLED and FAST_PRESENTER_ENABLED and not mentions_chart_form(question):
+        route = question_router.route(question, today)
+        # Other answers are written by the presenter LLM for the question's own wording
+        if route is not None and route.tool not in CHART_BUILDERS:
+            route = None
+    return question_fingerprint(question, today, route)
+
+
+async def loaded_toolset_fingerprint() -> str:
+    """Fingerprint of the toolset, loading it first if this is the first question."""
+    await sql_toolset.get_tools()
+    return sql_toolset.fingerprint
+
+
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+    tool_fingerprint=loaded_toolset_fingerprint,
+    data_version=data_version,
+    coalesce_timeout_seconds=QUESTION_COALESCE_TIMEOUT_SECONDS,
+    # Follow-ups are answered from the session's own earlier results
+    context_dependent=(
+        (lambda question, state: is_follow_up(question) and session_results.has_previous(state))
+        if SESSION_RESULTS_ENABLED else lambda question, state: False),
+    question_key=question_key,
+    # A session served a cached or coalesced answer follows up on that answer's results
+    capture=session_results.last_results,
+    restore=session_results.restore,
+)
+
+remember_presentation = response_cache.remember_response(
+    STATE_FINAL_PRESENTATION)
+
+cache_stats.register("response", response_cache.stats)
+cache_stats.register("tool", tool_cache.stats)
+cache_stats.register("session", session_results.stats)
+
+
+async def warm_up() -> dict:
+    """Load the toolset, schema summary and data version ahead of the first question."""
+    tools = await sql_toolset.get_tools()
+    status = {
+        "ready": sql_toolset.ready,
+        "tools": len(tools),
+        "tools_source": sql_toolset.source,
+        "tools_load_seconds": sql_toolset.load_seconds,
+    }
+    if sql_toolset.ready:
+        status["schema"] = bool(await schema_catalog.summary())
+        status["data_version"] = await data_version.current() is not None
+    return status
+
+
+async def retriever_instruction(context: ReadonlyContext) -> str:
+    """Build the retriever instruction with the cached schema summary inlined.
+
+    Discovery runs once, on the first question, and again only when the
+    schema version changes.
+    """
+    schema_summary = await schema_catalog.summary()
+    if schema_summary:
+        discovery = f"""**Step 1: Known Schema**
+    - The database schema has already been discovered for you:
+    ```
+    {schema_summary}
+    ```
+    - Do NOT call `list-tables`; go straight to the business tools below"""
+        schema_rule = "Rely on the schema above instead of re-discovering it"
+    else:
+        discovery = """**Step 1: Discovery**
+    - ALWAYS start by using the `list-tables` tool to discover available database tables and their schemas
+    - This gives you the current database structure without guessing"""
+        schema_rule = "Never assume database structure - always discover first using list-tables"
+
+    earlier_results = session_results.describe(context.state)
+    if earlier_results:
+        earlier_results = f"""
+    **Earlier Results in This Conversation**
+    {earlier_results}
+    - If the question refines or re-presents one of these (e.g. "only EMEA", "as a chart"), call that tool again with EXACTLY the same arguments; it is answered from this conversation without querying the database
+    """
+
+    return f"""
     You are a Senior Data Retriever for '{COMPANY_NAME}'. Your goal is to answer user questions by querying the corporate database. 
     
     **Your Workflow:**
 
-    **Step 1: Discovery**
-    - ALWAYS start by using the `list-tables` tool to discover available database tables and their schemas
-    - This gives you the current database structure without guessing
-    
+    {discovery}
+    {earlier_results}
     **Step 2: Analysis**
-    - Based on the user's question and discovered schema, determine which tools are most appropriate
+    - Based on the user's question and the schema, determine which tools are most appropriate
     - Available tools include: list-tables, get-sales-kpis, get-monthly-sales-trend, get-sales-by-category, get-sales-by-region, get-top-customers, search-products, search-customers
     
     **Step 3: Execution**
     - Execute the appropriate tool(s) to get the requested information
+    - When the question needs several independent tools (e.g. revenue by region AND by category), call them ALL in the same turn rather than one after another; they run in parallel
     - Use date ranges like '2024-01-01' to '2024-12-31' when tools require date parameters
+    - Tool results come back in a compact form: `columns`, `rows` (value arrays), `row_count` and `stats`. Large results are cut down: `omitted_rows` counts rows left out (ranked results end with an "Other" row, series keep their latest rows), and `bucketed` names the period (month, quarter, year) a long series was summed into
+    
+    **Step 4: Answer**
+    - The tool results are handed to the presenter automatically; do NOT copy the rows into your answer
+    - Reply with one short sentence naming what you retrieved
     
     **Decision Logic:**
     - IF the request cannot be answered with available tools, return: {{"status": "irrelevant"}}
-    - ELSE proceed to get and return the data
+    - ELSE proceed to get the data
     
     **Important:** 
-    - Never assume database structure - always discover first using list-tables
+    - {schema_rule}
     - Use the specific tools designed for common business queries
     - Provide date ranges in YYYY-MM-DD format when required
-    """,
+    """
+
+
+def compact_query_data(callback_context: CallbackContext) -> None:
+    """Replace the retriever's text with the shaped tool results, size-bounded."""
+    tool_results = turn_tool_results(callback_context.state)
+    if not tool_results:
+        return None
+    session_results.remember(callback_context.state, tool_results)
+    callback_context.state[STATE_QUERY_DATA] = query_data_document(
+        tool_results, callback_context.state.get(STATE_QUERY_DATA),
+        max_chars=QUERY_DATA_MAX_CHARS)
+    return None
+
+
+async def route_question(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Answer a common question with one direct tool call, skipping the retriever LLM.
+
+    Questions the router is not confident about, and tool failures, fall
+    through to the retriever as before.
+    """
+    if not ROUTER_ENABLED:
+        return None
+    route = question_router.route(user_text(callback_context), date.today())
+    if route is None:
+        ROUTER_DECISIONS.labels("llm").inc()
+        return None
+    tools = {tool.name: tool for tool in await sql_toolset.get_tools()}
+    if route.tool not in tools:
+        ROUTER_DECISIONS.labels("llm").inc()
+        return None
+    started = time.perf_counter()
+    try:
+        result = await tools[route.tool].func(**route.args)
+    except Exception as error:
+        logger.exception("Routed call to %s failed; falling back to the retriever", route.tool)
+        ERRORS.labels("tool", route.tool, type(error).__name__).inc()
+        ROUTER_DECISIONS.labels("llm").inc()
+        return None
+    TOOL_SECONDS.labels(route.tool).observe(time.perf_counter() - started)
+    ROUTER_DECISIONS.labels(route.intent).inc()
+    note = (f"Retrieved {route.tool} for {route.args['start_date']} to "
+            f"{route.args['end_date']} (routed: {route.intent}).")
+    return answer_from_results(
+        callback_context, [{"tool": route.tool, "args": route.args, "result": result}], note)
+
+
+async def reuse_previous_results(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Answer follow-ups ("only EMEA", "as a pie chart") from the previous answer's results."""
+    if not SESSION_RESULTS_ENABLED:
+        return None
+    refinement = await session_results.refine(
+        callback_context.state, user_text(callback_context), date.today())
+    if refinement is None:
+        return None
+    results, note = refinement
+    return answer_from_results(
+        callback_context, results, f"Reused the previous results ({note}).", refined=True)
+
+
+def answer_from_results(callback_context: CallbackContext, results: list[dict], note: str,
+                        refined: bool = False) -> types.Content:
+    """Hand `results` to the presenter as this turn's data, skipping the retriever LLM."""
+    for index, result in enumerate(results):
+        value = result["result"]
+        # ADK wraps non-dict tool results the same way
+        store_tool_result(callback_context.state, f"local-{index}", result["tool"], result["args"],
+                          value if isinstance(value, dict) else {"result": value})
+    tool_results = turn_tool_results(callback_context.state)
+    session_results.remember(callback_context.state, tool_results, refined=refined)
+    callback_context.state[STATE_QUERY_DATA] = query_data_document(
+        tool_results, note, max_chars=QUERY_DATA_MAX_CHARS)
+    return types.Content(role="model", parts=[types.Part(text=note)])
+
+
+retriever_agent = Agent(
+    name="retriever_agent",
+    model=GEMINI_QUERY_ANALYST_MODEL_NAME,
+    tools=[sql_toolset],
+    description="""A Data Retriever agent capable of querying information from a corporate PostgreSQL database. It uses available tools perform the query.""",
+    instruction=retriever_instruction,
     output_key=STATE_QUERY_DATA,
     include_contents='none',
+    before_agent_callback=[reset_tool_results, reuse_previous_results, route_question],
+    before_tool_callback=session_results.serve_from_history,
+    after_tool_callback=record_tool_result,
+    after_agent_callback=compact_query_data,
     generate_content_config=types.GenerateContentConfig(
         temperature=0.1,
         max_output_tokens=2048,
@@ -96,6 +393,26 @@ retriever_agent = Agent(
     ),
 )
 
+
+async def present_without_llm(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Answer single chartable tool results from a template, skipping the presenter LLM."""
+    # A requested chart type or table is left to the presenter LLM
+    if not FAST_PRESENTER_ENABLED or mentions_chart_form(user_text(callback_context)):
+        return None
+    presentation = build_presentation(
+        turn_tool_results(callback_context.state))
+    if presentation is None:
+        return None
+    callback_context.state[STATE_FINAL_PRESENTATION] = presentation.model_dump(
+        exclude_none=True)
+    remember_presentation(callback_context)
+    FAST_PRESENTER_RESPONSES.inc()
+    return types.Content(
+        role="model",
+        parts=[types.Part(text=presentation.model_dump_json())],
+    )
+
+
 presenter_agent = Agent(
     name="presenter_agent",
     model=GEMINI_PRESENTER_MODEL_NAME,
@@ -105,6 +422,8 @@ presenter_agent = Agent(
     
     **Query Results**: {{ {STATE_QUERY_DATA} }}
 
+    The results are JSON: each entry of `results` names the `tool` and `args` and holds `data` with `columns`, `rows` (one value array per row, in column order), `row_count` and per-column `stats` (min/max/mean, and sum for additive measures, over ALL rows). When `omitted_rows` is present, rows did not fit: ranked results end with an "Other" rollup of the rest, and series with `"omitted": "earliest"` keep only their latest rows; use `stats` for totals. When `bucketed` is present, a long series was summed into that period (month, quarter or year).
+
     **Your Output Options:**
 
     **Case 1: Unable to Answer**
@@ -181,6 +500,9 @@ presenter_agent = Agent(
     - Always provide context and insights, not just raw data
     """,
     output_schema=FinalPresentation,
+    output_key=STATE_FINAL_PRESENTATION,
+    before_agent_callback=present_without_llm,
+    after_agent_callback=remember_presentation,
     generate_content_config=types.GenerateContentConfig(
         temperature=0.3,
         max_output_tokens=3072,
@@ -193,8 +515,31 @@ presenter_agent = Agent(
     ),
 )
 
-root_agent = SequentialAgent(
+
+class AnswerPipeline(SequentialAgent):
+    """SequentialAgent that releases the response cache's hold on the question, however the run ends.
+
+    A run that raises or is closed by a disconnecting client skips the
+    plugins' after-run callbacks, so the metrics plugin's timers are dropped here.
+    """
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        try:
+            async with Aclosing(super()._run_async_impl(ctx)) as agen:
+                async for event in agen:
+                    yield event
+        except BaseException:
+            metrics = ctx.plugin_manager.get_plugin("metrics")
+            if isinstance(metrics, MetricsPlugin):
+                metrics.discard(ctx.invocation_id)
+            raise
+        finally:
+            response_cache.release(ctx.invocation_id)
+
+
+root_agent = AnswerPipeline(
     name='corporate_agent',
     sub_agents=[retriever_agent, presenter_agent],
     description="An agent that retrieves data from a corporate database and presents the results to the user in a friendly format.",
+    before_agent_callback=response_cache.serve_cached_response,
 )
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+from google.auth import jwt
+from google.auth.transport.requests import Request
+from google.oauth2 import id_token
+
+
+class IdTokenCache:
+    """Caches a Google ID token for one audience and refreshes it ahead of expiry.
+
+    Once a token is within `refresh_margin_seconds` of expiring, the next
+    caller kicks off a background refresh and keeps using the still-valid
+    token; only an expired (or missing) token is fetched inline. The
+    frontend, deployed separately, has its own smaller synchronous cache.
+    """
+
+    def __init__(self, audience: str, refresh_margin_seconds: float = 300.0,
+                 clock: Callable[[], float] = time.time):
+        self.audience = audience
+        self._refresh_margin_seconds = refresh_margin_seconds
+        self._clock = clock
+        # Reuse one HTTP session for metadata-server / OAuth round-trips
+        self._request = Request(session=requests.Session())
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refreshing = False
+
+    def _fetch(self):
+        token = id_token.fetch_id_token(self._request, self.audience)
+        claims = jwt.decode(token, verify=False)
+        with self._lock:
+            self._token = token
+            self._expires_at = float(claims.get("exp", 0))
+
+    def _background_refresh(self):
+        try:
+            self._fetch()
+        except Exception:
+            pass  # keep serving the current token; retried on the next call
+        finally:
+            self._refreshing = False
+
+    def get(self) -> str:
+        """Return a valid ID token, fetching or scheduling a refresh as needed."""
+        now = self._clock()
+        with self._lock:
+            token, expires_at = self._token, self._expires_at
+            needs_refresh = (token is not None and not self._refreshing
+                             and expires_at - now < self._refresh_margin_seconds)
+            if needs_refresh and expires_at > now:
+                self._refreshing = True
+        if token is None or expires_at <= now:
+            self._fetch()
+            return self._token  # type: ignore[return-value]
+        if needs_refresh:
+            threading.Thread(target=self._background_refresh, daemon=True).start()
+        return token
+
+    def bearer(self) -> str:
+        """Authorization header value, usable as a toolbox `client_headers` getter."""
+        return f"Bearer {self.get()}"
+
+    async def abearer(self) -> str:
+        """Async `bearer`; an inline fetch runs in a worker thread, off the event loop."""
+        if self._token is None or self._expires_at <= self._clock():
+            return f"Bearer {await asyncio.to_thread(self.get)}"
+        return self.bearer()
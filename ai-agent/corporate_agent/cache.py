@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a TTL."""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be a positive integer")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for `key`, or `default` on a miss."""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry  # type: ignore[misc]
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Store `value`, evicting the least recently used entry when full."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """Drop a single entry if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every entry; counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters and the current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+class DataVersion:
+    """Polls an async data-version probe at most once per `check_interval_seconds`.
+
+    Subscribers are notified whenever the probed version differs from the
+    previously observed one, so dependent caches can drop stale entries.
+    """
+
+    def __init__(self, probe: Callable[[], Awaitable[Any]],
+                 check_interval_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self._probe = probe
+        self._check_interval_seconds = check_interval_seconds
+        self._clock = clock
+        self._lock = asyncio.Lock()
+        self._checked_at: Optional[float] = None
+        self._version: Any = None
+        self._listeners: list[Callable[[], None]] = []
+
+    def subscribe(self, listener: Callable[[], None]):
+        self._listeners.append(listener)
+
+    def _is_fresh(self) -> bool:
+        return (self._checked_at is not None
+                and self._clock() - self._checked_at < self._check_interval_seconds)
+
+    async def current(self) -> Any:
+        """Return the latest known version, re-probing when the interval elapsed."""
+        if self._is_fresh():
+            return self._version
+        async with self._lock:
+            # Another caller may have probed while we waited for the lock
+            if self._is_fresh():
+                return self._version
+            self._checked_at = self._clock()
+            try:
+                version = await self._probe()
+            except Exception:
+                # Unknown freshness: keep the last version and rely on TTLs.
+                return self._version
+            changed = self._version is not None and version != self._version
+            self._version = version
+        if changed:
+            self.notify()
+        return version
+
+    def notify(self):
+        """Tell every subscriber that the underlying data changed."""
+        for listener in self._listeners:
+            listener()
+
+
+class SingleFlight:
+    """Coalesces concurrent async calls that share a key into one execution.
+
+    The first caller starts the call as a task; callers arriving while it is
+    in flight await the same task and receive its result (or exception).
+    The task is shielded, so a cancelled caller does not cancel the shared
+    work for everyone else.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved when every caller went away
@@ -0,0 +1,209 @@
+import time
+from typing import Any, Callable, Optional
+
+from google.adk.agents.base_agent import BaseAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+TOOL_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_SECONDS = Histogram(
+    "corporate_agent_request_seconds",
+    "End-to-end latency of one question, from user message to final event.",
+    buckets=LLM_BUCKETS,
+)
+AGENT_SECONDS = Histogram(
+    "corporate_agent_stage_seconds",
+    "Time spent in each agent (stage) of the pipeline.",
+    ["agent"],
+    buckets=LLM_BUCKETS,
+)
+LLM_SECONDS = Histogram(
+    "corporate_agent_llm_call_seconds",
+    "Latency of each model call, per agent.",
+    ["agent"],
+    buckets=LLM_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "corporate_agent_llm_tokens",
+    "Model tokens per agent; direction is input, output or thinking.",
+    ["agent", "direction"],
+)
+TOOL_SECONDS = Histogram(
+    "corporate_agent_tool_call_seconds",
+    "Latency of each toolbox tool call, including tool-cache hits.",
+    ["tool"],
+    buckets=TOOL_BUCKETS,
+)
+ERRORS = Counter(
+    "corporate_agent_errors",
+    "Errors raised by model or tool calls.",
+    ["stage", "name", "error"],
+)
+FAST_PRESENTER_RESPONSES = Counter(
+    "corporate_agent_fast_presenter_responses",
+    "Answers built from a template without calling the presenter model.",
+)
+ROUTER_DECISIONS = Counter(
+    "corporate_agent_router_decisions",
+    "Questions answered by a direct tool call, per intent; intent=llm when left to the retriever.",
+    ["intent"],
+)
+
+
+class CacheStatsCollector(Collector):
+    """Exports `stats()` of the in-memory caches at scrape time.
+
+    Caches register themselves by name; counters (hits, misses, evictions,
+    invalidations, coalesced, refinements) become Prometheus counters and everything
+    else a gauge.
+    """
+
+    COUNTERS = ("hits", "misses", "evictions", "invalidations", "coalesced", "refinements")
+
+    def __init__(self):
+        self._caches: dict[str, Callable[[], dict]] = {}
+
+    def register(self, name: str, stats: Callable[[], dict]):
+        self._caches[name] = stats
+
+    def collect(self):
+        families: dict[str, Any] = {}
+        for cache, stats in self._caches.items():
+            for key, value in stats().items():
+                if key not in families:
+                    if key in self.COUNTERS:
+                        families[key] = CounterMetricFamily(
+                            f"corporate_agent_cache_{key}",
+                            f"Cache {key} since start.", labels=["cache"])
+                    else:
+                        families[key] = GaugeMetricFamily(
+                            f"corporate_agent_cache_{key}",
+                            f"Current cache {key.replace('_', ' ')}.", labels=["cache"])
+                families[key].add_metric([cache], value)
+        yield from families.values()
+
+
+cache_stats = CacheStatsCollector()
+REGISTRY.register(cache_stats)
+
+
+class MetricsPlugin(BasePlugin):
+    """ADK plugin recording per-stage, per-LLM-call and per-tool latency plus tokens.
+
+    Start times are kept per invocation (and per function call for tools)
+    because sessions run concurrently. Stages that end early, e.g. a cached
+    answer or the template presenter, are closed when the invocation ends.
+    A run that raises or is abandoned never reaches `after_run_callback`;
+    `discard` drops what it left behind.
+    """
+
+    def __init__(self, name: str = "metrics", clock: Callable[[], float] = time.perf_counter):
+        super().__init__(name)
+        self._clock = clock
+        self._started: dict[tuple, float] = {}
+
+    def _start(self, key: tuple):
+        self._started[key] = self._clock()
+
+    def _stop(self, key: tuple) -> Optional[float]:
+        started = self._started.pop(key, None)
+        return None if started is None else self._clock() - started
+
+    def discard(self, invocation_id: str):
+        """Forget the start times of an invocation that ended without `after_run_callback`."""
+        for key in [key for key in self._started if key[0] == invocation_id]:
+            del self._started[key]
+
+    async def before_run_callback(self, *, invocation_context: InvocationContext) -> None:
+        self._start((invocation_context.invocation_id,))
+        return None
+
+    async def after_run_callback(self, *, invocation_context: InvocationContext) -> None:
+        invocation_id = invocation_context.invocation_id
+        for key in [key for key in self._started if key[0] == invocation_id]:
+            elapsed = self._stop(key)
+            if len(key) == 1:
+                REQUEST_SECONDS.observe(elapsed)
+            elif key[1] == "agent":
+                AGENT_SECONDS.labels(key[2]).observe(elapsed)
+        return None
+
+    async def before_agent_callback(self, *, agent: BaseAgent,
+                                    callback_context: CallbackContext) -> None:
+        self._start((callback_context.invocation_id, "agent", agent.name))
+        return None
+
+    async def after_agent_callback(self, *, agent: BaseAgent,
+                                   callback_context: CallbackContext) -> None:
+        elapsed = self._stop((callback_context.invocation_id, "agent", agent.name))
+        if elapsed is not None:
+            AGENT_SECONDS.labels(agent.name).observe(elapsed)
+        return None
+
+    async def before_model_callback(self, *, callback_context: CallbackContext,
+                                    llm_request: LlmRequest) -> None:
+        self._start((callback_context.invocation_id, "llm", callback_context.agent_name))
+        return None
+
+    async def after_model_callback(self, *, callback_context: CallbackContext,
+                                   llm_response: LlmResponse) -> None:
+        # Streaming yields partial chunks first; usage arrives with the final one
+        if llm_response.partial:
+            return None
+        agent = callback_context.agent_name
+        elapsed = self._stop((callback_context.invocation_id, "llm", agent))
+        if elapsed is not None:
+            LLM_SECONDS.labels(agent).observe(elapsed)
+        usage = llm_response.usage_metadata
+        if usage is not None:
+            for direction, count in (("input", usage.prompt_token_count),
+                                     ("output", usage.candidates_token_count),
+                                     ("thinking", usage.thoughts_token_count)):
+                if count:
+                    LLM_TOKENS.labels(agent, direction).inc(count)
+        if llm_response.error_code:
+            ERRORS.labels("llm", agent, str(llm_response.error_code)).inc()
+        return None
+
+    async def on_model_error_callback(self, *, callback_context: CallbackContext,
+                                      llm_request: LlmRequest, error: Exception) -> None:
+        agent = callback_context.agent_name
+        self._stop((callback_context.invocation_id, "llm", agent))
+        ERRORS.labels("llm", agent, type(error).__name__).inc()
+        # Nothing here recovers from the error, so the run ends without after_run_callback
+        self.discard(callback_context.invocation_id)
+        return None
+
+    async def before_tool_callback(self, *, tool: BaseTool, tool_args: dict[str, Any],
+                                   tool_context: ToolContext) -> None:
+        self._start((tool_context.invocation_id, "tool", tool_context.function_call_id))
+        return None
+
+    async def after_tool_callback(self, *, tool: BaseTool, tool_args: dict[str, Any],
+                                  tool_context: ToolContext, result: dict) -> None:
+        elapsed = self._stop(
+            (tool_context.invocation_id, "tool", tool_context.function_call_id))
+        if elapsed is not None:
+            TOOL_SECONDS.labels(tool.name).observe(elapsed)
+        return None
+
+    async def on_tool_error_callback(self, *, tool: BaseTool, tool_args: dict[str, Any],
+                                     tool_context: ToolContext, error: Exception) -> None:
+        elapsed = self._stop(
+            (tool_context.invocation_id, "tool", tool_context.function_call_id))
+        if elapsed is not None:
+            TOOL_SECONDS.labels(tool.name).observe(elapsed)
+        ERRORS.labels("tool", tool.name, type(error).__name__).inc()
+        self.discard(tool_context.invocation_id)
+        return None
+
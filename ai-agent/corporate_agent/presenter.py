@@ -0,0 +1,158 @@
+import json
+from typing import Any, Callable, Optional
+
+from .models import FinalPresentation
+from .tool_results import parse_rows
+
+VEGA_LITE_SCHEMA = "https://vega.github.io/schema/vega-lite/v5.json"
+
+# Tools that only support the answer (lookups, discovery) and never block the fast path.
+AUXILIARY_TOOLS = frozenset({"list-tables", "search-products", "search-customers"})
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _money(value: float) -> str:
+    return f"${value:,.2f}"
+
+
+def _period(args: dict) -> str:
+    start, end = args.get("start_date"), args.get("end_date")
+    return f" ({start} to {end})" if start and end else ""
+
+
+def _clean_rows(rows: list[dict], label: str, value: str) -> Optional[list[dict]]:
+    """Keep rows with a label and a numeric value; None if the shape is unexpected."""
+    cleaned = []
+    for row in rows:
+        amount = _number(row.get(value))
+        if row.get(label) is None or amount is None:
+            return None
+        cleaned.append({**row, value: round(amount, 2)})
+    return cleaned
+
+
+def _spec(title: str, values: list[dict], mark: dict, encoding: dict) -> str:
+    return json.dumps({
+        "$schema": VEGA_LITE_SCHEMA,
+        "title": title,
+        "data": {"values": values},
+        "mark": mark,
+        "encoding": encoding,
+    })
+
+
+def _breakdown_summary(rows: list[dict], label: str, value: str, noun: str) -> str:
+    total = sum(row[value] for row in rows)
+    top = rows[0]
+    summary = f"{top[label]} leads with {_money(top[value])}"
+    if total:
+        summary += f", {top[value] / total:.0%} of the {_money(total)} total across {len(rows)} {noun}"
+    summary += "."
+    if len(rows) > 1:
+        runner_up = rows[1]
+        summary += f" {runner_up[label]} follows with {_money(runner_up[value])}"
+        if len(rows) > 2:
+            last = rows[-1]
+            summary += f", and {last[label]} is lowest at {_money(last[value])}"
+        summary += "."
+    return summary
+
+
+def monthly_trend(args: dict, rows: list[dict]) -> Optional[FinalPresentation]:
+    rows = _clean_rows(rows, "month_str", "revenue")
+    if not rows:
+        return None
+    total = sum(row["revenue"] for row in rows)
+    peak = max(rows, key=lambda row: row["revenue"])
+    low = min(rows, key=lambda row: row["revenue"])
+    summary = (
+        f"Revenue from {rows[0]['month_str']} to {rows[-1]['month_str']} totalled "
+        f"{_money(total)}, averaging {_money(total / len(rows))} per month. "
+        f"The strongest month was {peak['month_str']} at {_money(peak['revenue'])} "
+        f"and the weakest was {low['month_str']} at {_money(low['revenue'])}."
+    )
+    spec = _spec(
+        f"Monthly Revenue{_period(args)}",
+        [{"month": row["month_str"], "revenue": row["revenue"]} for row in rows],
+        {"type": "line", "point": True},
+        {
+            # "YYYY-MM" parses as UTC midnight; local time units would show the
+            # previous month in time zones west of UTC
+            "x": {"field": "month", "type": "temporal", "timeUnit": "utcyearmonth", "title": "Month"},
+            "y": {"field": "revenue", "type": "quantitative", "title": "Revenue ($)"},
+            "tooltip": [
+                {"field": "month", "type": "temporal", "timeUnit": "utcyearmonth", "title": "Month"},
+                {"field": "revenue", "type": "quantitative", "title": "Revenue ($)", "format": ",.2f"},
+            ],
+        },
+    )
+    return FinalPresentation(response_type="visual", summary_text=summary, vega_lite_spec=spec)
+
+
+def _bar_chart(label: str, value: str, label_title: str, value_title: str,
+               noun: str, title: str) -> Callable[[dict, list[dict]], Optional[FinalPresentation]]:
+    def build(args: dict, rows: list[dict]) -> Optional[FinalPresentation]:
+        rows = _clean_rows(rows, label, value)
+        if not rows:
+            return None
+        rows = sorted(rows, key=lambda row: row[value], reverse=True)
+        tooltip = [
+            {"field": key, "type": "quantitative" if isinstance(field_value, (int, float)) else "nominal"}
+            for key, field_value in rows[0].items()
+        ]
+        spec = _spec(
+            f"{title}{_period(args)}",
+            rows,
+            {"type": "bar"},
+            {
+                "x": {"field": label, "type": "nominal", "title": label_title, "sort": "-y"},
+                "y": {"field": value, "type": "quantitative", "title": value_title},
+                "tooltip": tooltip,
+            },
+        )
+        return FinalPresentation(
+            response_type="visual",
+            summary_text=_breakdown_summary(rows, label, value, noun),
+            vega_lite_spec=spec,
+        )
+
+    return build
+
+
+# Tool name -> builder turning its rows into a presentation.
+CHART_BUILDERS: dict[str, Callable[[dict, list[dict]], Optional[FinalPresentation]]] = {
+    "get-monthly-sales-trend": monthly_trend,
+    "get-sales-by-region": _bar_chart(
+        "region", "revenue", "Region", "Revenue ($)", "regions", "Revenue by Region"),
+    "get-sales-by-category": _bar_chart(
+        "category", "revenue", "Category", "Revenue ($)", "categories", "Revenue by Category"),
+    "get-top-customers": _bar_chart(
+        "company_name", "total_spend", "Customer", "Total Spend ($)", "customers", "Top Customers by Spend"),
+}
+
+
+def build_presentation(tool_results: list[dict]) -> Optional[FinalPresentation]:
+    """Build a chart answer without the LLM when the turn used exactly one chartable tool.
+
+    Returns None whenever the results are ambiguous (several business tools,
+    an unknown tool, empty, oddly shaped or truncated rows), leaving the
+    presenter LLM to handle the answer.
+    """
+    business = [result for result in tool_results
+                if result.get("tool") not in AUXILIARY_TOOLS]
+    if len(business) != 1:
+        return None
+    result = business[0].get("result")
+    if isinstance(result, dict) and (result.get("omitted_rows") or result.get("bucketed")):
+        return None
+    builder = CHART_BUILDERS.get(business[0]["tool"])
+    rows = parse_rows(result)
+    if builder is None or not rows:
+        return None
+    return builder(business[0].get("args") or {}, rows)
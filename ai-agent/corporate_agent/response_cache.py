@@ -0,0 +1,189 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.genai import types
+
+from .cache import DataVersion, TTLCache
+from .models import FinalPresentation
+
+
+class ResponseCache:
+    """Caches `FinalPresentation` answers in front of the sequential agent.
+
+    Entries are keyed on `question_key(question)` (by default the question
+    with its whitespace and case folded) and the fingerprint of the loaded
+    toolset, awaited from `tool_fingerprint()` so a question asked while
+    the toolset is still loading is looked up and stored under the same
+    key. Nothing is cached while that fingerprint is empty (the toolset
+    failed to load). The whole cache is dropped whenever the data version
+    of the `sales`/`customers`/`products` tables changes.
+
+    With `coalesce_timeout_seconds` > 0, a question that misses while a
+    question with the same key is already being answered waits (up to that
+    long) for the in-flight answer instead of running the pipeline again.
+
+    Questions for which `context_dependent(question, state)` returns True
+    (follow-ups such as "only EMEA") depend on the session, so they are
+    neither served nor stored. Whatever `capture(state)` returns when an
+    answer is stored is handed to `restore(state, captured)` in each session
+    that answer is later served to (from cache or as a coalesced waiter), so
+    those sessions' state matches the answer they were given.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 900.0,
+                 tool_fingerprint: Optional[Callable[[], Awaitable[str]]] = None,
+                 data_version: Optional[DataVersion] = None,
+                 coalesce_timeout_seconds: float = 0.0,
+                 context_dependent: Callable[[str, Any], bool] = lambda question, state: False,
+                 capture: Callable[[Any], Any] = lambda state: None,
+                 restore: Callable[[Any, Any], None] = lambda state, captured: None,
+                 question_key: Callable[[str], str] = lambda question: " ".join(question.lower().split())):
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._context_dependent = context_dependent
+        self._question_key = question_key
+        self._capture = capture
+        self._restore = restore
+        self._tool_fingerprint = tool_fingerprint
+        self._data_version = data_version
+        self._coalesce_timeout_seconds = coalesce_timeout_seconds
+        # invocation -> cache key of runs whose answer will be stored
+        self._pending: dict[str, str] = {}
+        # key -> (answer, captured state) of the invocation currently computing it
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._leaders: dict[str, tuple[str, asyncio.Future]] = {}
+        self.invalidations = 0
+        self.coalesced = 0
+        if data_version is not None:
+            data_version.subscribe(self._on_data_changed)
+
+    async def make_key(self, question: str) -> Optional[str]:
+        """The cache key of `question`, or None while no toolset is loaded."""
+        fingerprint = await self._tool_fingerprint() if self._tool_fingerprint else "-"
+        if not fingerprint:
+            return None
+        return f"{fingerprint}:{self._question_key(question)}"
+
+    def _on_data_changed(self):
+        self._cache.clear()
+        self.invalidations += 1
+
+    async def lookup(self, key: str) -> Optional[tuple[FinalPresentation, Any]]:
+        if self._data_version is not None:
+            await self._data_version.current()
+        return self._cache.get(key)
+
+    def store(self, key: str, presentation: FinalPresentation, captured: Any = None):
+        # Only cache real answers; failures should be retried next time.
+        if presentation.response_type == "unable_to_answer":
+            return
+        self._cache.set(key, (presentation, captured))
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "invalidations": self.invalidations,
+                "coalesced": self.coalesced}
+
+    async def _await_in_flight(self, key: str) -> Optional[tuple[FinalPresentation, Any]]:
+        future = self._in_flight.get(key)
+        if future is None:
+            return None
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(future), self._coalesce_timeout_seconds)
+        except asyncio.TimeoutError:
+            # The leader is stuck or failed without finishing: stop waiting on it
+            self._abandon(key, future)
+            return None
+
+    def _abandon(self, key: str, future: asyncio.Future):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        for invocation_id, (_, leader_future) in list(self._leaders.items()):
+            if leader_future is future:
+                del self._leaders[invocation_id]
+        if not future.done():
+            future.set_result(None)
+
+    def _lead(self, invocation_id: str, key: str):
+        """Mark `invocation_id` as the one answering `key` for concurrent askers."""
+        if self._coalesce_timeout_seconds <= 0 or key in self._in_flight:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        self._leaders[invocation_id] = (key, future)
+
+    def _finish(self, invocation_id: str, answer: Optional[tuple[FinalPresentation, Any]]):
+        """Hand the leader's answer (None: run it yourself) to every waiter."""
+        key, future = self._leaders.pop(invocation_id, (None, None))
+        if future is None:
+            return
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if not future.done():
+            future.set_result(answer)
+
+    async def serve_cached_response(self, callback_context: CallbackContext) -> Optional[types.Content]:
+        """`before_agent_callback` for the root agent: answer from cache on a hit."""
+        question = user_text(callback_context)
+        if not question or self._context_dependent(question, callback_context.state):
+            return None
+        key = await self.make_key(question)
+        if key is None:
+            return None
+        answer = await self.lookup(key)
+        if answer is None and self._coalesce_timeout_seconds > 0:
+            answer = await self._await_in_flight(key)
+            if answer is not None:
+                self.coalesced += 1
+        if answer is None:
+            self._pending[callback_context.invocation_id] = key
+            self._lead(callback_context.invocation_id, key)
+            return None
+        presentation, captured = answer
+        self._restore(callback_context.state, captured)
+        return types.Content(
+            role="model",
+            parts=[types.Part(text=presentation.model_dump_json())],
+        )
+
+    def remember_response(self, state_key: str) -> Callable[[CallbackContext], None]:
+        """Build an `after_agent_callback` storing the presentation at `state_key`."""
+
+        def _remember(callback_context: CallbackContext) -> None:
+            key = self._pending.pop(callback_context.invocation_id, None)
+            result = callback_context.state.get(state_key)
+            if key is None or not result:
+                return None
+            try:
+                presentation = FinalPresentation.model_validate(result)
+            except ValueError:
+                return None
+            captured = self._capture(callback_context.state)
+            self.store(key, presentation, captured)
+            # Waiters only get answers that would have been cached
+            if presentation.response_type != "unable_to_answer":
+                self._finish(callback_context.invocation_id, (presentation, captured))
+            return None
+
+        return _remember
+
+    def release(self, invocation_id: str):
+        """Drop the bookkeeping for a finished run, however it ended.
+
+        Call this from a `finally` around the whole run: after-agent callbacks
+        are skipped when the run raises or the client disconnects, and an
+        unresolved leader would hold its waiters for the full coalesce timeout.
+        """
+        self._pending.pop(invocation_id, None)
+        self._finish(invocation_id, None)
+
+
+def user_text(callback_context: CallbackContext) -> str:
+    """The text of the user message that started this invocation."""
+    content = callback_context.user_content
+    if not content or not content.parts:
+        return ""
+    return " ".join(part.text for part in content.parts if part.text).strip()
@@ -0,0 +1,264 @@
+import functools
+import json
+import re
+from typing import Any, Awaitable, Callable, Optional
+
+# Columns that identify rows rather than measure anything
+_ID_COLUMNS = ("id",)
+# Name parts of measures that do not add up across rows
+_NON_ADDITIVE = {"avg", "average", "mean", "median", "rate", "ratio", "pct", "percent",
+                 "percentage", "share", "margin", "price", "score", "distinct", "unique"}
+_PERIOD_RE = re.compile(r"^\d{4}-\d{2}(-\d{2})?$")
+# Coarser and coarser periods for bucketing a YYYY-MM(-DD) series
+_BUCKETS = {
+    "month": lambda period: period[:7],
+    "quarter": lambda period: f"{period[:4]}-Q{(int(period[5:7]) - 1) // 3 + 1}",
+    "year": lambda period: period[:4],
+}
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _is_id(column: str) -> bool:
+    return column in _ID_COLUMNS or column.endswith("_id")
+
+
+def _decode(result: Any) -> Any:
+    if isinstance(result, str):
+        try:
+            return json.loads(result)
+        except ValueError:
+            return result
+    return result
+
+
+def _clip(value: Any, max_chars: int) -> Any:
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars] + "…"
+    return value
+
+
+def numeric_columns(columns: list[str], rows: list[list]) -> list[int]:
+    """Indexes of the measure columns: every non-null value parses as a number."""
+    indexes = []
+    for index, column in enumerate(columns):
+        if _is_id(column):
+            continue
+        values = [row[index] for row in rows if row[index] is not None]
+        if values and all(_number(value) is not None for value in values):
+            indexes.append(index)
+    return indexes
+
+
+def is_additive(column: str) -> bool:
+    """False for measures that must not be summed across rows (averages, prices, ratios, distinct counts)."""
+    return not set(column.lower().split("_")) & _NON_ADDITIVE
+
+
+def column_stats(columns: list[str], rows: list[list]) -> dict:
+    """min/max/mean (and sum, where it means something) of each measure column over all rows."""
+    stats = {}
+    for index in numeric_columns(columns, rows):
+        values = [_number(row[index]) for row in rows if row[index] is not None]
+        stats[columns[index]] = {
+            "min": round(min(values), 2),
+            "max": round(max(values), 2),
+            "mean": round(sum(values) / len(values), 2),
+        }
+        if is_additive(columns[index]):
+            stats[columns[index]]["sum"] = round(sum(values), 2)
+    return stats
+
+
+def _label_column(columns: list[str], measures: list[int]) -> Optional[int]:
+    return next((index for index in range(len(columns))
+                 if index not in measures and not _is_id(columns[index])), None)
+
+
+def _top_and_other(columns: list[str], values: list[list], max_rows: int) -> tuple[list[list], int]:
+    """The first `max_rows - 1` rows plus one "Other" row summing the additive measures of the rest."""
+    kept, rest = values[:max(max_rows - 1, 0)], values[max(max_rows - 1, 0):]
+    measures = numeric_columns(columns, values)
+    other = [None] * len(columns)
+    for index in measures:
+        if is_additive(columns[index]):
+            other[index] = round(sum(_number(row[index]) or 0.0 for row in rest), 2)
+    label = _label_column(columns, measures)
+    if label is not None:
+        other[label] = f"Other ({len(rest)} rows)"
+    return kept + [other], len(rest)
+
+
+def _bucket_series(columns: list[str], values: list[list], max_rows: int) -> Optional[tuple[list[list], str]]:
+    """Sum a date-labelled series into months, quarters or years until it fits in `max_rows`.
+
+    Only possible when the label is a YYYY-MM(-DD) period and every
+    measure can be added up; other columns of a bucket are left empty.
+    """
+    measures = numeric_columns(columns, values)
+    label = _label_column(columns, measures)
+    if (label is None or not all(is_additive(columns[index]) for index in measures)
+            or not all(isinstance(row[label], str) and _PERIOD_RE.match(row[label]) for row in values)):
+        return None
+    for unit, bucket_of in _BUCKETS.items():
+        buckets = {}
+        for row in values:
+            bucket = buckets.setdefault(bucket_of(row[label]), [None] * len(columns))
+            bucket[label] = bucket_of(row[label])
+            for index in measures:
+                bucket[index] = round((bucket[index] or 0.0) + (_number(row[index]) or 0.0), 2)
+        if len(buckets) <= max_rows:
+            return list(buckets.values()), unit
+    return None
+
+
+def compact_rows(rows: list[dict], max_rows: int = 50, max_cell_chars: int = 500,
+                 order: str = "unordered") -> dict:
+    """Encode row objects as columns + value arrays, capped at `max_rows` rows.
+
+    How rows past the cap are dropped depends on the tool's row `order`:
+
+    - "ranked" (largest first): the tail is folded into one trailing
+      "Other" row that sums the additive measures (`omitted_rows`).
+    - "series" (oldest first): rows are summed into coarser periods
+      (`bucketed` names the unit) or, when they cannot be, only the
+      latest rows are kept (`omitted_rows`, `omitted: "earliest"`).
+    - anything else: the first rows are kept (`omitted_rows`).
+
+    Summary statistics always cover every row.
+    """
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    values = [[_clip(row.get(column), max_cell_chars) for column in columns] for row in rows]
+    shaped = {
+        "columns": columns,
+        "rows": values,
+        "row_count": len(values),
+        "stats": column_stats(columns, values),
+    }
+    if len(values) <= max_rows:
+        return shaped
+
+    if order == "ranked":
+        shaped["rows"], shaped["omitted_rows"] = _top_and_other(columns, values, max_rows)
+        return shaped
+    if order == "series":
+        bucketed = _bucket_series(columns, values, max_rows)
+        if bucketed is not None:
+            shaped["rows"], shaped["bucketed"] = bucketed
+            return shaped
+        shaped["rows"] = values[-max_rows:] if max_rows > 0 else []
+        shaped["omitted_rows"] = len(values) - len(shaped["rows"])
+        shaped["omitted"] = "earliest"
+        return shaped
+    shaped["rows"] = values[:max_rows]
+    shaped["omitted_rows"] = len(values) - len(shaped["rows"])
+    return shaped
+
+
+def shape_result(result: Any, max_rows: int = 50, max_chars: int = 8000,
+                 max_cell_chars: int = 500, order: str = "unordered") -> Any:
+    """Turn a toolbox result into a compact, size-bounded value for the model.
+
+    Row lists become the columnar form of `compact_rows`; the row cap is
+    halved until the encoded result fits in `max_chars`. Anything that is
+    not a row list is passed through, clipped to `max_chars`.
+    """
+    decoded = _decode(result)
+    if not (isinstance(decoded, list) and decoded
+            and all(isinstance(row, dict) for row in decoded)):
+        return _clip(result, max_chars)
+    shaped = compact_rows(decoded, max_rows, max_cell_chars, order)
+    while len(json.dumps(shaped, default=str)) > max_chars and len(shaped["rows"]) > 2:
+        max_rows = max(2, len(shaped["rows"]) // 2)
+        shaped = compact_rows(decoded, max_rows, max_cell_chars, order)
+    return shaped
+
+
+def expand_rows(shaped: Any) -> Optional[list[dict]]:
+    """Inverse of `compact_rows`: columnar result back to row objects."""
+    if not (isinstance(shaped, dict) and "columns" in shaped and "rows" in shaped):
+        return None
+    columns = shaped["columns"]
+    return [dict(zip(columns, row)) for row in shaped["rows"]]
+
+
+def shape_results(max_rows: int = 50, max_chars: int = 8000, max_cell_chars: int = 500,
+                  row_order: Optional[dict[str, str]] = None
+                  ) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """Build a tool wrapper that shapes every result of the async `tool`.
+
+    `row_order` maps tool names to the order their rows come in (see
+    `compact_rows`). The wrapper keeps the tool's name, docstring and
+    signature so ADK builds the same function declaration for the model.
+    """
+
+    def wrap(tool: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        order = (row_order or {}).get(tool.__name__, "unordered")
+
+        @functools.wraps(tool)
+        async def shaped_tool(*args, **kwargs):
+            return shape_result(await tool(*args, **kwargs),
+                                max_rows, max_chars, max_cell_chars, order)
+
+        return shaped_tool
+
+    return wrap
+
+
+def query_data_document(tool_results: list[dict], retriever_note: Any,
+                        max_chars: int = 16000) -> str:
+    """Assemble the presenter's `sql_query_data` from the shaped tool results.
+
+    The retriever's own note is kept alongside the results. If the document
+    exceeds `max_chars`, the largest results are cut to their summary
+    statistics first; then the note goes, then the largest results are
+    dropped whole (counted in `omitted_results`). The encoded JSON is never
+    truncated.
+    """
+    results = [
+        {"tool": result.get("tool"), "args": result.get("args") or {},
+         "data": _unwrap(result.get("result"))}
+        for result in tool_results
+    ]
+    document = {"retriever_note": _clip(retriever_note, 2000), "results": results}
+    encoded = json.dumps(document, default=str)
+    for result in sorted(results, key=_size, reverse=True):
+        if len(encoded) <= max_chars:
+            break
+        data = result["data"]
+        if isinstance(data, dict) and "rows" in data:
+            result["data"] = {"columns": data["columns"], "row_count": data["row_count"],
+                              "stats": data.get("stats", {}), "rows_omitted_for_size": True}
+        else:
+            result["data"] = _clip(data, 500)
+        encoded = json.dumps(document, default=str)
+    if len(encoded) > max_chars:
+        document["retriever_note"] = None
+        encoded = json.dumps(document, default=str)
+    while len(encoded) > max_chars and results:
+        results.remove(max(results, key=_size))
+        document["omitted_results"] = document.get("omitted_results", 0) + 1
+        encoded = json.dumps(document, default=str)
+    return encoded
+
+
+def _size(result: dict) -> int:
+    return len(json.dumps(result, default=str))
+
+
+def _unwrap(result: Any) -> Any:
+    # ADK wraps non-dict tool returns as {"result": value}
+    if isinstance(result, dict) and set(result) == {"result"}:
+        result = result["result"]
+    return _decode(result)
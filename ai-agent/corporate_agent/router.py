@@ -0,0 +1,446 @@
+import calendar
+import difflib
+import functools
+import json
+import math
+import re
+from collections import Counter
+from datetime import date, timedelta
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+_TOKEN_RE = re.compile(r"[a-z]+|\d+")
+
+MONTHS = {name.lower(): index for index, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): index for index, name in enumerate(calendar.month_abbr) if name})
+MONTHS["sept"] = 9
+_MONTH = r"(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?"
+_ISO = r"(\d{4}-\d{2}-\d{2})"
+_YEAR = r"((?:19|20)\d{2})"
+_THROUGH = r"\s*(?:to|through|thru|until|till|-|–)\s*"
+# Lead-in words that belong to a date phrase ("over the past 6 months")
+_LEAD_IN = r"(?:\b(?:in|for|during|over|from|within|across|of|between)\s+(?:the\s+)?)?"
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "twelve": 12, "fifteen": 15, "twenty": 20,
+    "fifty": 50, "hundred": 100,
+}
+_COUNT = r"(\d+|" + "|".join(NUMBER_WORDS) + r")"
+ORDINALS = {"first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3,
+            "fourth": 4, "4th": 4, "last": 4}
+
+# Words that do not change the meaning of an analytics question.
+STOPWORDS = frozenset({
+    "a", "an", "the", "of", "for", "in", "on", "by", "to", "is", "are", "was",
+    "were", "me", "our", "we", "us", "my", "i", "what", "which", "who", "whom",
+    "show", "tell", "give", "list", "please", "can", "could", "you", "and",
+    "with", "during", "from", "at", "do", "does", "did", "how", "much", "many",
+})
+
+# Collapse common wording variants onto one canonical token.
+SYNONYMS = {
+    "biggest": "top", "largest": "top", "best": "top", "highest": "top",
+    "customers": "customer", "clients": "customer", "client": "customer",
+    "products": "product", "categories": "category", "regions": "region",
+    "sales": "revenue", "income": "revenue", "earnings": "revenue",
+    "months": "month", "monthly": "month",
+}
+
+# Words that always need the analyst: comparisons, filters, derived measures.
+BLOCKERS = frozenset({
+    "compare", "comparison", "compared", "vs", "versus", "why", "forecast",
+    "predict", "projection", "growth", "grow", "grew", "change", "changed",
+    "difference", "except", "excluding", "exclude", "without", "not", "only",
+    "just", "average", "avg", "mean", "median", "typical", "share", "percent",
+    "percentage", "margin", "ratio", "capita", "worst", "bottom", "least", "lowest",
+    "fewest", "smallest", "minimum", "min", "weakest", "slowest", "poorest", "less",
+    "lower", "order", "orders", "search", "find",
+})
+# "Per" asks for a rate ("revenue per unit", "per customer") unless it names
+# one of the breakdowns a tool returns ("per month", "per region").
+_RATE_RE = re.compile(r"\bper[\s-]+(?!(?:month|region|territory|territorie|market|location|"
+                      r"area|category|categorie|product|segment|type|group)s?\b)")
+
+# Words any routable question may contain besides the intent's own vocabulary.
+FILLER = frozenset({
+    "revenue", "total", "overall", "chart", "graph", "plot", "visualize",
+    "visualise", "see", "get", "want", "like", "would", "data", "numbers",
+    "figures", "report", "breakdown", "broken", "down", "split", "all", "time",
+    "ever", "date", "so", "far", "been", "has", "have", "had", "company",
+    "business", "performance", "perform", "performed", "doing", "look", "looks",
+    "looked", "it", "its", "there", "be", "that", "this", "these", "those",
+    "view", "display", "current", "currently", "period", "now", "up",
+    "need", "summarize", "summarise", "summary", "money", "made", "make",
+    "generated", "generate", "bring", "brought", "into", "as", "s",
+})
+
+# The tools.yaml tool each intent calls; its vocabulary, trigger patterns
+# (checked on the question with date phrases removed) and exemplars for
+# the similarity fallback.
+INTENTS: dict[str, dict[str, Any]] = {
+    "monthly_trend": {
+        "tool": "get-monthly-sales-trend",
+        "vocabulary": {"month", "trend", "trends", "over", "per", "each", "every",
+                       "line", "timeline", "evolution", "evolve", "evolved", "seasonality"},
+        "patterns": [r"\bmonthly\b", r"\b(by|per|each|every) month\b",
+                     r"\bmonth[- ]?(over|by|to)[- ]?month\b", r"\btrends?\b",
+                     r"\bover time\b", r"\btimeline\b", r"\bseasonality\b"],
+        "exemplars": ["monthly revenue trend", "revenue by month", "sales trend over time",
+                      "month by month sales", "how did revenue evolve each month"],
+    },
+    "sales_by_region": {
+        "tool": "get-sales-by-region",
+        "vocabulary": {"region", "regional", "geography", "geographic", "geographical",
+                       "geo", "per", "each", "where", "territory", "territories",
+                       "market", "markets", "location", "locations", "area", "areas"},
+        "patterns": [r"\bregions?\b", r"\bregional\b", r"\bgeograph", r"\bgeo\b",
+                     r"\b(by|per|each) (territory|market|location|area)\b",
+                     r"\bterritories\b"],
+        "exemplars": ["revenue by region", "sales per region", "regional revenue breakdown",
+                      "which region sells the most", "geographic split of revenue"],
+    },
+    "sales_by_category": {
+        "tool": "get-sales-by-category",
+        "vocabulary": {"category", "categorie", "segment", "segments", "line", "lines",
+                       "type", "types", "per", "each", "group", "groups", "perform",
+                       "performs", "performing", "top", "most", "sells", "selling", "product"},
+        "patterns": [r"\bcategor(y|ies)\b", r"\bproduct (lines?|segments?|types?|groups?)\b",
+                     r"\bsegments?\b"],
+        "exemplars": ["revenue by category", "sales per product category",
+                      "which category performs best", "product line breakdown",
+                      "category revenue split"],
+    },
+    "top_customers": {
+        "tool": "get-top-customers",
+        "vocabulary": {"top", "customer", "account", "accounts", "buyer", "buyers",
+                       "spend", "spent", "spends", "spending", "spender", "spenders",
+                       "most", "valuable", "leading", "bought", "buy", "buys",
+                       "purchase", "purchases", "purchased", "purchasing", "important",
+                       "key", "whale", "whales"},
+        "patterns": [r"\b(top|biggest|largest|best|highest|leading|most valuable|key|"
+                     r"most important)( spending| paying)?( \d+| " + "| ".join(NUMBER_WORDS)
+                     + r")?( spending| paying)? (customers?|clients?|accounts?|buyers?|spenders?)\b",
+                     r"\b(customers?|clients?|accounts?) (who|that) (spent|spend|spends|bought|buy|buys|purchased)"
+                     r" (the )?most\b",
+                     r"\bwho (spent|spends|bought|buys|purchased) the most\b",
+                     r"\b(biggest|largest|top) spenders?\b"],
+        "exemplars": ["top customers by spend", "biggest customers", "who spent the most",
+                      "best clients by revenue", "most valuable accounts"],
+    },
+    # Matched only when no breakdown intent is: "total revenue by region" is a region question.
+    "sales_kpis": {
+        "tool": "get-sales-kpis",
+        "weak": True,
+        "vocabulary": {"kpi", "kpis", "key", "indicator", "indicators", "metric", "metrics",
+                       "profit", "profits", "unit", "units", "sold", "sell", "earn",
+                       "earned", "headline", "did", "we", "how", "much", "many", "results",
+                       "number", "gross", "net", "volume"},
+        "patterns": [r"\bkpis?\b", r"\bkey (performance )?(indicators|metrics)\b",
+                     r"\b(total|overall) (revenue|sales|profits?|income|earnings)\b",
+                     r"\bprofits?\b", r"\bunits? sold\b", r"\bhow many units\b",
+                     r"\bhow much (revenue|money|did we (sell|make|earn))\b",
+                     r"\bheadline (numbers|figures|metrics)\b"],
+        "exemplars": ["sales kpis", "total revenue and profit", "how much did we sell",
+                      "key performance indicators", "units sold and profit"],
+    },
+}
+
+
+class Route(BaseModel):
+    """A question the router can answer with one tool call."""
+    intent: str
+    tool: str
+    args: dict[str, Any]
+    confidence: float
+    method: str
+
+
+def _tokens(text: str) -> list[str]:
+    return [SYNONYMS.get(token, token) for token in _TOKEN_RE.findall(text)]
+
+
+def _count(text: str) -> int:
+    return int(text) if text.isdigit() else NUMBER_WORDS[text]
+
+
+def _shift_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    return date(year, month + 1, min(day.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def _month_range(year: int, first: int, last: int) -> tuple[date, date]:
+    return date(year, first, 1), date(year, last, calendar.monthrange(year, last)[1])
+
+
+def _year_for(month: int, year: Optional[str], today: date) -> int:
+    """An explicit year, else the most recent year in which `month` has started."""
+    if year:
+        return int(year)
+    return today.year if month <= today.month else today.year - 1
+
+
+def _relative(match: re.Match, today: date) -> tuple[date, date]:
+    count, unit = _count(match.group(1)), match.group(2).rstrip("s")
+    if unit == "day":
+        return today - timedelta(days=count), today
+    if unit == "week":
+        return today - timedelta(weeks=count), today
+    if unit == "month":
+        return _shift_months(today, -count), today
+    return _shift_months(today, -12 * count), today
+
+
+def _quarter(index: int, year: int) -> tuple[date, date]:
+    return _month_range(year, 3 * index - 2, 3 * index)
+
+
+def _this_quarter(today: date) -> int:
+    return (today.month - 1) // 3 + 1
+
+
+def _last_quarter(today: date) -> tuple[date, date]:
+    quarter = _this_quarter(today) - 1
+    return _quarter(quarter, today.year) if quarter else _quarter(4, today.year - 1)
+
+
+# (pattern, period builder). Checked in order; each match is cut out of the question.
+PERIOD_PATTERNS = [
+    (_ISO + r"(?:" + _THROUGH + r"|\s+and\s+)" + _ISO,
+     lambda m, today: (date.fromisoformat(m.group(1)), date.fromisoformat(m.group(2)))),
+    (r"\b(?:since|after) " + _ISO,
+     lambda m, today: (date.fromisoformat(m.group(1)), today)),
+    (r"\b(?:year to date|ytd|so far this year|this year so far)\b",
+     lambda m, today: (date(today.year, 1, 1), today)),
+    (r"\b(?:last|past|previous|trailing) " + _COUNT + r" (days?|weeks?|months?|years?)\b",
+     _relative),
+    (r"\b(?:past|trailing) (day|week|month|year)\b",
+     lambda m, today: _relative(re.match(r"(1) (\w+)", f"1 {m.group(1)}"), today)),
+    (r"\b(?:last|previous|prior) week\b", lambda m, today: (today - timedelta(weeks=1), today)),
+    (r"\bthis month\b", lambda m, today: (date(today.year, today.month, 1), today)),
+    (r"\b(?:last|previous|prior) month\b",
+     lambda m, today: _month_range(_shift_months(today, -1).year,
+                                   _shift_months(today, -1).month,
+                                   _shift_months(today, -1).month)),
+    (r"\bthis quarter\b",
+     lambda m, today: (_quarter(_this_quarter(today), today.year)[0], today)),
+    (r"\b(?:last|previous|prior) quarter\b", lambda m, today: _last_quarter(today)),
+    (r"\bthis year\b", lambda m, today: (date(today.year, 1, 1), today)),
+    (r"\b(?:last|previous|prior) year\b",
+     lambda m, today: (date(today.year - 1, 1, 1), date(today.year - 1, 12, 31))),
+    (r"\b(?:q([1-4])|(first|second|third|fourth|1st|2nd|3rd|4th|last) quarter)"
+     r"(?:\s*(?:of|in)?\s*" + _YEAR + r")?\b",
+     lambda m, today: _quarter(int(m.group(1)) if m.group(1) else ORDINALS[m.group(2)],
+                               int(m.group(3)) if m.group(3) else today.year)),
+    (r"\b(?:h([12])|(first|second|1st|2nd) half)(?:\s*(?:of|in)?\s*" + _YEAR + r")?\b",
+     lambda m, today: _month_range(
+         int(m.group(3)) if m.group(3) else today.year,
+         1 if (m.group(1) or str(ORDINALS[m.group(2)])) == "1" else 7,
+         6 if (m.group(1) or str(ORDINALS[m.group(2)])) == "1" else 12)),
+    (r"\b" + _MONTH + _THROUGH + _MONTH + r"(?:\s*(?:of|in)?\s*" + _YEAR + r")?\b",
+     lambda m, today: _month_range(
+         _year_for(MONTHS[m.group(2)], m.group(3), today),
+         MONTHS[m.group(1)], MONTHS[m.group(2)])
+     if MONTHS[m.group(1)] <= MONTHS[m.group(2)] else None),
+    (r"\b" + _MONTH + r"(?:\s*(?:of|in)?\s*" + _YEAR + r")\b",
+     lambda m, today: _month_range(int(m.group(2)), MONTHS[m.group(1)], MONTHS[m.group(1)])),
+    (r"\b(?:in|for|during) " + _MONTH + r"(?![a-z])",
+     lambda m, today: _month_range(_year_for(MONTHS[m.group(1)], None, today),
+                                   MONTHS[m.group(1)], MONTHS[m.group(1)])),
+    (r"(?:\bbetween " + _YEAR + r" and |\b" + _YEAR + _THROUGH + r")" + _YEAR + r"\b",
+     lambda m, today: (date(int(m.group(1) or m.group(2)), 1, 1), date(int(m.group(3)), 12, 31))
+     if (m.group(1) or m.group(2)) <= m.group(3) else None),
+    (r"\b" + _YEAR + r"\b",
+     lambda m, today: (date(int(m.group(1)), 1, 1), date(int(m.group(1)), 12, 31))),
+]
+_PERIOD_PATTERNS = [(re.compile(_LEAD_IN + pattern), build) for pattern, build in PERIOD_PATTERNS]
+
+
+def parse_periods(text: str, today: date) -> tuple[list[tuple[date, date]], str]:
+    """Find every date range in `text`; returns them and the text with them cut out.
+
+    More than one range (or an unparseable one) means the question compares
+    periods or is ambiguous, which the caller treats as "not routable".
+    """
+    periods = []
+    for pattern, build in _PERIOD_PATTERNS:
+        while True:
+            match = pattern.search(text)
+            if match is None:
+                break
+            period = build(match, today)
+            if period is None or period[0] > period[1]:
+                periods.append(None)
+            else:
+                periods.append(period)
+            text = text[:match.start()] + " " + text[match.end():]
+    return periods, text
+
+
+# Every word the router understands; anything else close to one is treated as a typo of it.
+KNOWN_WORDS = sorted(
+    set(FILLER) | set(BLOCKERS) | set(STOPWORDS) | set(SYNONYMS) | set(SYNONYMS.values())
+    | set(MONTHS) | set(NUMBER_WORDS) | set(ORDINALS)
+    | {word for spec in INTENTS.values() for word in spec["vocabulary"]}
+    | {word for spec in INTENTS.values() for exemplar in spec["exemplars"]
+       for word in _TOKEN_RE.findall(exemplar)}
+    | {"monthly", "regional", "categories", "customers", "clients", "quarter", "half",
+       "year", "years", "week", "weeks", "day", "days", "months", "since", "between",
+       "kpis", "past", "trailing", "previous", "prior"})
+_KNOWN_WORDS = frozenset(KNOWN_WORDS)
+
+
+@functools.lru_cache(maxsize=4096)
+def _correct_word(word: str) -> str:
+    if len(word) < 5 or word in _KNOWN_WORDS:
+        return word
+    close = difflib.get_close_matches(word, KNOWN_WORDS, n=1, cutoff=0.8)
+    return close[0] if close else word
+
+
+def correct_spelling(text: str) -> str:
+    """Replace words that are near misses of a known word (`revnue` -> `revenue`)."""
+    return re.sub(r"[a-z]+", lambda match: _correct_word(match.group(0)), text)
+
+
+def _trigrams(text: str) -> Counter:
+    padded = f"  {' '.join(_tokens(text))} "
+    return Counter(padded[index:index + 3] for index in range(len(padded) - 2))
+
+
+def _cosine(left: Counter, right: Counter) -> float:
+    dot = sum(count * right[gram] for gram, count in left.items())
+    norm = math.sqrt(sum(c * c for c in left.values())) * math.sqrt(sum(c * c for c in right.values()))
+    return dot / norm if norm else 0.0
+
+
+class QuestionRouter:
+    """Maps common analytics questions straight to one toolbox tool call.
+
+    Each intent has trigger patterns; date phrases ("Q3 2024", "last
+    month", "since 2024-03-01") become `start_date`/`end_date`. A question
+    is routed only when exactly one intent matches, at most one period is
+    mentioned, no blocker word (comparisons, filters, derived measures)
+    appears, and at least `min_confidence` of its meaningful words are
+    explained by the intent. With `similarity` enabled, questions no
+    pattern matches are compared with each intent's exemplars by
+    character-trigram cosine similarity, which tolerates typos and
+    rephrasing. Everything else is left to the retriever LLM.
+    """
+
+    def __init__(self, min_confidence: float = 0.75, similarity: bool = True,
+                 min_similarity: float = 0.6, default_start: date = date(2000, 1, 1),
+                 default_limit: int = 10, max_limit: int = 100):
+        self._min_confidence = min_confidence
+        self._similarity = similarity
+        self._min_similarity = min_similarity
+        self._default_start = default_start
+        self._default_limit = default_limit
+        self._max_limit = max_limit
+        self._patterns = {
+            intent: [re.compile(pattern) for pattern in spec["patterns"]]
+            for intent, spec in INTENTS.items()
+        }
+        self._exemplars = {
+            intent: [_trigrams(exemplar) for exemplar in spec["exemplars"]]
+            for intent, spec in INTENTS.items()
+        }
+
+    def _matched_intents(self, text: str) -> list[str]:
+        matched = [intent for intent, patterns in self._patterns.items()
+                   if any(pattern.search(text) for pattern in patterns)]
+        strong = [intent for intent in matched if not INTENTS[intent].get("weak")]
+        return strong or matched
+
+    def _similar_intent(self, text: str) -> tuple[Optional[str], float]:
+        grams = _trigrams(text)
+        scores = sorted(
+            ((max(_cosine(grams, exemplar) for exemplar in exemplars), intent)
+             for intent, exemplars in self._exemplars.items()),
+            reverse=True)
+        (best, intent), (runner_up, _) = scores[0], scores[1]
+        if best < self._min_similarity or best - runner_up < 0.1:
+            return None, best
+        return intent, best
+
+    def _limit(self, text: str) -> tuple[int, str]:
+        match = re.search(r"\b(?:top|biggest|largest|best|highest|leading|first)\s+" + _COUNT + r"\b",
+                          text) or re.search(r"\b" + _COUNT + r"\s+(?:top|biggest|largest|best)?\s*"
+                                             r"(?:customers|clients|accounts|buyers|spenders)\b", text)
+        if match is None:
+            return self._default_limit, text
+        limit = min(_count(match.group(1)), self._max_limit)
+        return limit, text[:match.start(1)] + " " + text[match.end(1):]
+
+    def _coverage(self, text: str, intent: str) -> float:
+        content = [token for token in _tokens(text) if token not in STOPWORDS]
+        if not content:
+            return 0.0
+        vocabulary = INTENTS[intent]["vocabulary"]
+        explained = [token for token in content
+                     if token in vocabulary or token in FILLER]
+        return len(explained) / len(content)
+
+    def route(self, question: str, today: date) -> Optional[Route]:
+        text = correct_spelling(" ".join(question.lower().replace("’", "'").split()))
+        if not text or any(token in BLOCKERS for token in _tokens(text)) or _RATE_RE.search(text):
+            return None
+        periods, text = parse_periods(text, today)
+        if len(periods) > 1 or None in periods:
+            return None
+        start, end = periods[0] if periods else (self._default_start, today)
+
+        matched = self._matched_intents(text)
+        method, similarity = "pattern", None
+        if not matched and self._similarity:
+            intent, similarity = self._similar_intent(text)
+            matched, method = ([intent], "similarity") if intent else ([], method)
+        if len(matched) != 1:
+            return None
+        intent = matched[0]
+
+        args = {"start_date": start.isoformat(), "end_date": end.isoformat()}
+        if intent == "top_customers":
+            args["limit_count"], text = self._limit(text)
+        confidence = self._coverage(text, intent)
+        if similarity is not None:
+            confidence = max(confidence, similarity)
+        if confidence < self._min_confidence:
+            return None
+        return Route(intent=intent, tool=INTENTS[intent]["tool"], args=args,
+                     confidence=round(confidence, 3), method=method)
+
+
+# "How many" and "how much" ask for a count or an amount: they stay in the key.
+_KEY_STOPWORDS = STOPWORDS - {"how", "many", "much"}
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def question_fingerprint(question: str, today: date, route: Optional[Route] = None) -> str:
+    """Identify what a question asks for, as a response cache key.
+
+    A routed question whose answer depends only on its tool call is
+    identified by that call: the intent and its arguments, whose dates are
+    already absolute. Any other question keeps its content words in order,
+    repeats included (synonyms and plurals folded; "how many" and "how
+    much" kept), so "customers who bought laptops but not phones" is not
+    its reverse. Every period it mentions is resolved against `today`, so
+    "last month" asked in May and in June are different questions.
+    """
+    if route is not None:
+        return f"{route.intent}:{json.dumps(route.args, sort_keys=True)}"
+    text = correct_spelling(" ".join(question.lower().replace("’", "'").split()))
+    periods, text = parse_periods(text, today)
+    words = [_singular(SYNONYMS.get(word, word)) for word in _TOKEN_RE.findall(text)
+             if word not in _KEY_STOPWORDS]
+    dates = ",".join("?" if period is None else f"{period[0]}/{period[1]}" for period in periods)
+    return f"{' '.join(words)}|{dates}"
@@ -0,0 +1,82 @@
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Optional
+
+from .cache import DataVersion
+
+
+def _as_json(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def summarize_tables(list_tables_output: Any) -> str:
+    """Turn detailed `list-tables` output into one `table(column type, ...)` line per table."""
+    rows = _as_json(list_tables_output)
+    if isinstance(rows, dict):
+        rows = [rows]
+    if not isinstance(rows, list):
+        return ""
+
+    lines = []
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        details = _as_json(row.get("object_details", row))
+        if not isinstance(details, dict):
+            continue
+        name = details.get("object_name") or row.get("object_name")
+        columns = [
+            f"{column.get('column_name')} {column.get('data_type', '')}".strip()
+            for column in details.get("columns") or []
+            if isinstance(column, dict) and column.get("column_name")
+        ]
+        if name:
+            lines.append(f"{name}({', '.join(columns)})")
+    return "\n".join(sorted(lines))
+
+
+class SchemaCatalog:
+    """Keeps a compact schema summary discovered once via `list-tables`.
+
+    The summary is rebuilt only when the schema version probe reports a
+    change, so the retriever no longer pays a discovery turn per question.
+    """
+
+    def __init__(self, list_tables: Callable[[], Awaitable[Any]],
+                 schema_version: Optional[DataVersion] = None):
+        self._list_tables = list_tables
+        self._schema_version = schema_version
+        self._lock = asyncio.Lock()
+        self._summary = ""
+        self._stale = True
+        if schema_version is not None:
+            schema_version.subscribe(self.mark_stale)
+
+    def mark_stale(self):
+        self._stale = True
+
+    async def refresh(self) -> str:
+        """Re-run discovery; keeps the previous summary if the toolbox is unreachable."""
+        async with self._lock:
+            if not self._stale:
+                return self._summary
+            try:
+                summary = summarize_tables(await self._list_tables())
+            except Exception:
+                return self._summary
+            if summary:
+                self._summary = summary
+                self._stale = False
+            return self._summary
+
+    async def summary(self) -> str:
+        if self._schema_version is not None:
+            await self._schema_version.current()
+        if self._stale:
+            return await self.refresh()
+        return self._summary
@@ -0,0 +1,349 @@
+import hashlib
+import json
+import re
+import time
+from datetime import date
+from typing import Any, Optional
+
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+from .cache import DataVersion
+from .result_shaping import compact_rows, expand_rows, numeric_columns
+from .router import NUMBER_WORDS, STOPWORDS, parse_periods
+from .tool_cache import canonicalize_args
+
+# Index of this session's earlier tool results: reference -> stored_at, oldest first.
+STATE_RESULT_HISTORY = "result_history"
+# Each earlier result lives under its own key, so a turn only writes the results it adds.
+STATE_RESULT_PREFIX = "stored_result_"
+# The results the previous answer was built from: references into the history,
+# or the rows themselves after a refinement.
+STATE_LAST_RESULTS = "last_results"
+
+# Phrases that point back at the previous answer.
+_REFERENCE_RE = re.compile(
+    r"\b(those|these|them|same|previous|above|earlier|last (result|answer|one)s?"
+    r"|(that|this) (data|chart|graph|table|list|result|results|answer|one|breakdown|numbers)"
+    r"|(that|this|it)( (as|in|into|by|but|for|again|instead|sorted|only)\b|$))")
+_LEAD_RE = re.compile(
+    r"^(only|just|now|and|but|then|what about|how about|filter|exclude|excluding|"
+    r"without|except|show only|keep only|sort|make it)\b")
+CHART_FORMS = ("pie", "donut", "doughnut", "line", "bar", "area", "scatter",
+               "table", "list", "text")
+_FORM_RE = re.compile(r"\b(?:as|in|into) an? (?:\w+ )?(chart|graph|table|list|" + "|".join(CHART_FORMS) + r")\b")
+_NAMED_FORM_RE = re.compile(
+    r"\b(?:pie|donut|doughnut|scatter)\b|\b(?:line|bar|area) (?:chart|graph|plot)\b|\btable\b")
+# Words a bare re-presentation request ("show it as a table please") may add.
+_FORM_FILLER = frozenset({"show", "display", "make", "put", "draw", "plot", "present", "please",
+                          "can", "could", "you", "me", "it", "instead", "again", "now", "chart", "graph"})
+_EXCLUDE_RE = re.compile(r"\b(?:exclude|excluding|without|except|not|minus|drop|remove)\b")
+_TOP_RE = re.compile(r"\b(top|first|highest|biggest|largest|bottom|lowest|smallest|last)\s+("
+                     + r"\d+|" + "|".join(NUMBER_WORDS) + r")\b")
+_SORT_RE = re.compile(r"\bsort(?:ed)?\b.*\b(asc|ascending|desc|descending|lowest first|highest first)\b")
+
+
+def result_key(tool_name: str, args: dict[str, Any]) -> str:
+    return f"{tool_name}|{json.dumps(canonicalize_args(args), sort_keys=True, default=str)}"
+
+
+def result_ref(tool_name: str, args: dict[str, Any]) -> str:
+    return hashlib.sha256(result_key(tool_name, args).encode()).hexdigest()[:16]
+
+
+def mentions_chart_form(question: str) -> bool:
+    """True when the question asks for a specific chart type or a table/text answer."""
+    text = question.lower()
+    return bool(_FORM_RE.search(text) or _NAMED_FORM_RE.search(text))
+
+
+def is_follow_up(question: str, today: Optional[date] = None) -> bool:
+    """True when the question refers back to the previous answer.
+
+    It must point at earlier results ("those", "that chart", "sort it"),
+    open elliptically ("only EMEA", "what about APAC") or only ask for
+    another form ("as a pie chart"). "This year" and "revenue by region as
+    a table" do not count.
+    """
+    _, text = parse_periods(" ".join(question.lower().split()), today or date.today())
+    text = " ".join(text.split())
+    if _REFERENCE_RE.search(text) or _LEAD_RE.search(text):
+        return True
+    return bool(_FORM_RE.search(text)) and _asks_only_for_form(text)
+
+
+def _asks_only_for_form(text: str) -> bool:
+    """True when nothing but a form ("as a pie chart") and filler is left of the question.
+
+    "Show that as a table" qualifies; "what about revenue by category as a
+    table" asks for other data and does not.
+    """
+    if not (_FORM_RE.search(text) or _NAMED_FORM_RE.search(text)):
+        return False
+    for pattern in (_LEAD_RE, _REFERENCE_RE, _FORM_RE, _NAMED_FORM_RE):
+        text = pattern.sub(" ", text)
+    rest = set(re.findall(r"[a-z]+", text)) - STOPWORDS - _FORM_FILLER
+    return not rest
+
+
+class SessionResults:
+    """Keeps each session's tool results in session state for follow-up questions.
+
+    Results are stored under a reference to `tool|canonical args` (at most
+    `max_entries`, oldest first out; results larger than `max_chars` once
+    encoded are not kept) and expire after `ttl_seconds`, or as soon as
+    `data_version` reports changed data (including `/caches/flush`). Each
+    result has its own state key, so a turn's state delta only carries
+    the results it added or changed plus a small index. A later call with
+    the same tool and arguments in the same session is answered from there
+    instead of the database, and follow-ups ("only EMEA", "top 3 of those",
+    "show that as a pie chart") are answered by filtering or reshaping the
+    previous answer's results locally.
+    """
+
+    def __init__(self, max_entries: int = 8, max_chars: int = 16000, ttl_seconds: float = 900.0,
+                 data_version: Optional[DataVersion] = None):
+        self._max_entries = max_entries
+        self._max_chars = max_chars
+        self._ttl_seconds = ttl_seconds
+        self._data_version = data_version
+        # Results stored before the last data change are stale
+        self._valid_from = 0.0
+        self.reused = 0
+        self.refined = 0
+        self.invalidations = 0
+        if data_version is not None:
+            data_version.subscribe(self._on_data_changed)
+
+    def _on_data_changed(self):
+        self._valid_from = time.time()
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {"hits": self.reused, "refinements": self.refined,
+                "invalidations": self.invalidations}
+
+    def _fresh(self, stored_at: float) -> bool:
+        return stored_at >= self._valid_from and time.time() - stored_at < self._ttl_seconds
+
+    async def _check_data_version(self):
+        if self._data_version is not None:
+            await self._data_version.current()
+
+    def _fits(self, result: dict) -> bool:
+        return len(json.dumps(result.get("result"), default=str)) <= self._max_chars
+
+    def _entry(self, state: Any, ref: str) -> Optional[dict]:
+        entry = state.get(STATE_RESULT_PREFIX + ref)
+        if entry is None or not self._fresh(entry["stored_at"]):
+            return None
+        return entry
+
+    def remember(self, state: Any, tool_results: list[dict], refined: bool = False):
+        """Record the results the current answer is built from.
+
+        Raw tool results also go into the keyed history; refined results
+        only become the target of the next follow-up. Only new or changed
+        results, the index and the previous-answer references are written.
+        """
+        if not tool_results or self._max_entries <= 0:
+            return
+        now = time.time()
+        results = [result for result in tool_results if self._fits(result)]
+        if refined:
+            self._set(state, STATE_LAST_RESULTS, [
+                {"tool": result["tool"], "args": result.get("args") or {},
+                 "result": result.get("result"), "stored_at": now} for result in results])
+            return
+
+        history = dict(state.get(STATE_RESULT_HISTORY) or {})
+        last = []
+        for result in results:
+            args = result.get("args") or {}
+            ref = result_ref(result["tool"], args)
+            entry = self._entry(state, ref)
+            # Reusing a result does not make its data any fresher
+            if entry is None or entry["result"] != result.get("result"):
+                entry = {"tool": result["tool"], "args": args,
+                         "result": result.get("result"), "stored_at": now}
+                state[STATE_RESULT_PREFIX + ref] = entry
+            history.pop(ref, None)
+            history[ref] = entry["stored_at"]
+            last.append({"ref": ref})
+        kept = dict([(ref, stored_at) for ref, stored_at in history.items()
+                     if self._fresh(stored_at)][-self._max_entries:])
+        for ref in history.keys() - kept.keys():
+            if state.get(STATE_RESULT_PREFIX + ref) is not None:
+                state[STATE_RESULT_PREFIX + ref] = None
+        self._set(state, STATE_RESULT_HISTORY, kept)
+        self._set(state, STATE_LAST_RESULTS, last)
+
+    @staticmethod
+    def _set(state: Any, key: str, value: Any):
+        # Assigning state always records a delta, even for an unchanged value
+        if state.get(key) != value:
+            state[key] = value
+
+    def last_results(self, state: Any) -> list[dict]:
+        """The results the previous answer was built from that are still fresh."""
+        results = []
+        for item in state.get(STATE_LAST_RESULTS) or []:
+            entry = self._entry(state, item["ref"]) if "ref" in item else item
+            if entry is not None and self._fresh(entry["stored_at"]):
+                results.append({"tool": entry["tool"], "args": entry["args"], "result": entry["result"]})
+        return results
+
+    def has_previous(self, state: Any) -> bool:
+        return bool(self.last_results(state))
+
+    def restore(self, state: Any, results: Optional[list[dict]]):
+        """Make `results` the previous answer's results; with none, forget the previous ones."""
+        if results:
+            self.remember(state, results)
+        else:
+            self._set(state, STATE_LAST_RESULTS, [])
+
+    def lookup(self, state: Any, tool_name: str, args: dict[str, Any]) -> Optional[Any]:
+        entry = self._entry(state, result_ref(tool_name, args))
+        return None if entry is None else entry["result"]
+
+    async def serve_from_history(self, tool: BaseTool, args: dict[str, Any],
+                                 tool_context: ToolContext) -> Optional[dict]:
+        """`before_tool_callback` for the retriever: reuse this session's earlier result."""
+        await self._check_data_version()
+        result = self.lookup(tool_context.state, tool.name, args)
+        if result is None:
+            return None
+        self.reused += 1
+        return result
+
+    def describe(self, state: Any) -> str:
+        """One line per stored result, for the retriever instruction."""
+        lines = []
+        for ref in state.get(STATE_RESULT_HISTORY) or {}:
+            entry = self._entry(state, ref)
+            if entry is None:
+                continue
+            rows = entry["result"].get("row_count") if isinstance(entry["result"], dict) else None
+            lines.append(f"- `{entry['tool']}` {json.dumps(entry['args'], sort_keys=True)}"
+                         + (f" ({rows} rows)" if rows is not None else ""))
+        return "\n".join(lines)
+
+    async def refine(self, state: Any, question: str, today: date) -> Optional[tuple[list[dict], str]]:
+        """Answer a follow-up from the previous answer's results, or None if it needs new data.
+
+        Supports keeping or excluding rows by a value mentioned in the
+        question, top/bottom N by the first measure, re-sorting, and asking
+        for another chart form of the same data. Follow-ups naming a new
+        period, or filters on results that were truncated, need the retriever.
+        """
+        text = " ".join(question.lower().split())
+        if not is_follow_up(text, today):
+            return None
+        await self._check_data_version()
+        previous = self.last_results(state)
+        if not previous:
+            return None
+        periods, _ = parse_periods(text, today)
+        if periods:
+            return None
+
+        refined, notes = [], []
+        for entry in previous:
+            result = _unwrap(entry["result"])
+            rows = expand_rows(result)
+            if rows is None:
+                return None
+            outcome = _refine_rows(text, result, rows)
+            full = self._entry(state, result_ref(entry["tool"], entry["args"]))
+            if outcome is not None and not outcome[2] and full is not None:
+                # "what about APAC" after "only EMEA": filter the full result instead
+                full_result = _unwrap(full["result"])
+                full_rows = expand_rows(full_result)
+                retry = _refine_rows(text, full_result, full_rows) if full_rows else None
+                if retry is not None and retry[2]:
+                    outcome = retry
+            if outcome is None:
+                return None
+            rows, note, _ = outcome
+            if note:
+                notes.append(f"{entry['tool']}: {note}")
+            refined.append({"tool": entry["tool"], "args": entry["args"],
+                            "result": compact_rows(rows, max_rows=max(len(rows), 1)) if rows else []})
+        if not notes and not _asks_only_for_form(text):
+            # A new question that happens to name a form is not a re-presentation
+            return None
+        self.refined += 1
+        return refined, "; ".join(notes) or "same data, presented differently"
+
+
+def _unwrap(result: Any) -> Any:
+    # ADK wraps non-dict tool returns as {"result": value}
+    if isinstance(result, dict) and set(result) == {"result"}:
+        result = result["result"]
+    if isinstance(result, str):
+        try:
+            return json.loads(result)
+        except ValueError:
+            return result
+    return result
+
+
+def _refine_rows(text: str, result: Any, rows: list[dict]) -> Optional[tuple[list[dict], str, bool]]:
+    """Apply the filters and orderings the follow-up asks for; None if it cannot be done locally.
+
+    Returns the rows, a note describing what was done, and whether rows
+    were filtered by a value named in the question.
+    """
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    values = [[row.get(column) for column in columns] for row in rows]
+    measures = [columns[index] for index in numeric_columns(columns, values)]
+    notes = []
+
+    mentioned = {}
+    for column in columns:
+        if column in measures:
+            continue
+        for row in rows:
+            value = row.get(column)
+            if isinstance(value, str) and value.strip() and re.search(
+                    rf"(?<![a-z0-9]){re.escape(value.lower())}(?![a-z0-9])", text):
+                mentioned.setdefault(column, set()).add(value)
+    if mentioned:
+        if isinstance(result, dict) and result.get("omitted_rows"):
+            return None
+        column, wanted = max(mentioned.items(), key=lambda item: len(item[1]))
+        if _EXCLUDE_RE.search(text):
+            rows = [row for row in rows if row.get(column) not in wanted]
+            notes.append(f"excluding {column} {', '.join(sorted(wanted))}")
+        else:
+            rows = [row for row in rows if row.get(column) in wanted]
+            notes.append(f"only {column} {', '.join(sorted(wanted))}")
+
+    top = _TOP_RE.search(text)
+    if top and measures:
+        count = int(top.group(2)) if top.group(2).isdigit() else NUMBER_WORDS[top.group(2)]
+        lowest = top.group(1) in ("bottom", "lowest", "smallest", "last")
+        if lowest and isinstance(result, dict) and result.get("omitted_rows"):
+            return None
+        rows = sorted((row for row in rows if not _is_other(row)),
+                      key=lambda row: _as_float(row.get(measures[0])), reverse=not lowest)[:count]
+        notes.append(f"{'bottom' if lowest else 'top'} {count} by {measures[0]}")
+
+    sort = _SORT_RE.search(text)
+    if sort and measures and not top:
+        ascending = sort.group(1) in ("asc", "ascending", "lowest first")
+        rows = sorted(rows, key=lambda row: _as_float(row.get(measures[0])), reverse=not ascending)
+        notes.append(f"sorted by {measures[0]} {'ascending' if ascending else 'descending'}")
+    return rows, ", ".join(notes), bool(mentioned)
+
+
+def _is_other(row: dict) -> bool:
+    return any(isinstance(value, str) and value.startswith("Other (") for value in row.values())
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,108 @@
+import functools
+import inspect
+import json
+from datetime import date, datetime
+from typing import Any, Awaitable, Callable, Mapping, Optional
+
+from .cache import DataVersion, SingleFlight, TTLCache
+
+_MISSING = object()
+
+_DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%Y%m%d", "%d.%m.%Y", "%m/%d/%Y")
+
+
+def canonical_date(value: Any) -> Any:
+    """Normalize a date-like value to YYYY-MM-DD, leaving anything else as is."""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return text
+
+
+def canonicalize_args(args: Mapping[str, Any]) -> dict:
+    """Canonicalize tool arguments so equivalent calls share one cache entry."""
+    canonical = {}
+    for name, value in args.items():
+        if name.endswith("_date"):
+            value = canonical_date(value)
+        elif name == "limit_count" and isinstance(value, (str, float)):
+            try:
+                value = int(float(value))
+            except ValueError:
+                pass
+        elif isinstance(value, str):
+            value = value.strip()
+        canonical[name] = value
+    return canonical
+
+
+class ToolResultCache:
+    """Memoizes toolbox tool results keyed on tool name plus canonical arguments.
+
+    Each tool can have its own TTL (0 disables caching for that tool), and
+    the cache is flushed when the shared `DataVersion` reports a change or
+    `flush()` is called after a reload of the database. Identical calls that
+    miss while one is already in flight share its backend call.
+    """
+
+    def __init__(self, max_entries: int = 1024, default_ttl_seconds: float = 300.0,
+                 tool_ttl_seconds: Optional[Mapping[str, float]] = None,
+                 data_version: Optional[DataVersion] = None):
+        self._cache = TTLCache(max_entries=max_entries,
+                               ttl_seconds=default_ttl_seconds)
+        self._tool_ttl_seconds = dict(tool_ttl_seconds or {})
+        self._data_version = data_version
+        self._in_flight = SingleFlight()
+        if data_version is not None:
+            data_version.subscribe(self.flush)
+
+    def ttl_for(self, tool_name: str) -> float:
+        return self._tool_ttl_seconds.get(tool_name, self._cache.ttl_seconds)
+
+    def flush(self):
+        """Drop every cached tool result, e.g. after `init.sql` was re-run."""
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "coalesced": self._in_flight.coalesced}
+
+    def wrap(self, tool: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """Return a drop-in replacement for the async `tool` that serves cached results.
+
+        The wrapper keeps the tool's name, docstring and signature so ADK
+        builds the same function declaration for the model.
+        """
+        tool_name = tool.__name__
+        signature = inspect.signature(tool)
+
+        @functools.wraps(tool)
+        async def cached_tool(*args, **kwargs):
+            arguments = canonicalize_args(
+                signature.bind(*args, **kwargs).arguments)
+            key = (tool_name, json.dumps(arguments, sort_keys=True, default=str))
+            ttl = self.ttl_for(tool_name)
+            if ttl <= 0:
+                return await self._in_flight.do(key, lambda: tool(**arguments))
+            if self._data_version is not None:
+                await self._data_version.current()
+            result = self._cache.get(key, _MISSING)
+            if result is not _MISSING:
+                return result
+
+            async def call_and_store():
+                result = await tool(**arguments)
+                self._cache.set(key, result, ttl_seconds=ttl)
+                return result
+
+            return await self._in_flight.do(key, call_and_store)
+
+        return cached_tool
@@ -0,0 +1,64 @@
+import json
+from typing import Any, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+from .result_shaping import expand_rows
+
+# Raw tool results of the current turn, keyed by function call id.
+STATE_TOOL_RESULTS = "tool_results"
+
+
+def parse_rows(result: Any) -> Optional[list[dict]]:
+    """Decode a toolbox result (JSON rows or the shaped columnar form) into a list of dicts."""
+    if isinstance(result, dict) and "result" in result:
+        result = result["result"]
+    if isinstance(result, dict):
+        return expand_rows(result)
+    if isinstance(result, str):
+        try:
+            result = json.loads(result)
+        except ValueError:
+            return None
+    if result is None:
+        return []
+    if isinstance(result, list) and all(isinstance(row, dict) for row in result):
+        return result
+    return None
+
+
+def reset_tool_results(callback_context: CallbackContext) -> None:
+    """`before_agent_callback` for the retriever: start each turn with no results."""
+    callback_context.state[STATE_TOOL_RESULTS] = {}
+    return None
+
+
+def store_tool_result(state: Any, call_id: str, tool_name: str,
+                      args: dict[str, Any], result: Any):
+    """Add one tool result to this turn's results in `state`."""
+    results = dict(state.get(STATE_TOOL_RESULTS) or {})
+    results[call_id or str(len(results))] = {
+        "tool": tool_name,
+        "args": args,
+        "result": result,
+    }
+    state[STATE_TOOL_RESULTS] = results
+
+
+def record_tool_result(tool: BaseTool, args: dict[str, Any],
+                       tool_context: ToolContext, tool_response: Any) -> None:
+    """`after_tool_callback` for the retriever: keep every tool result of the turn.
+
+    Results are keyed by function call id so the state deltas of parallel
+    calls in one turn merge instead of overwriting each other.
+    """
+    store_tool_result(tool_context.state, tool_context.function_call_id,
+                      tool.name, args, tool_response)
+    return None
+
+
+def turn_tool_results(state: Any) -> list[dict]:
+    """Return this turn's tool results in call order."""
+    return list((state.get(STATE_TOOL_RESULTS) or {}).values())
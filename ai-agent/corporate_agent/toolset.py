@@ -0,0 +1,260 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Callable, Iterable, Mapping, Optional
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.function_tool import FunctionTool
+from toolbox_core import ToolboxClient
+from toolbox_core.protocol import ParameterSchema
+from toolbox_core.utils import create_func_docstring
+
+logger = logging.getLogger(__name__)
+
+
+def toolset_fingerprint(toolset: Iterable[Any]) -> str:
+    """Hash tool names and descriptions so a changed toolbox manifest misses."""
+    manifest = sorted(
+        (getattr(tool, "__name__", repr(tool)), getattr(tool, "__doc__", "") or "")
+        for tool in toolset
+    )
+    return hashlib.sha256(json.dumps(manifest).encode()).hexdigest()[:16]
+
+
+def limit_concurrency(tool: Callable[..., Any], semaphore: asyncio.Semaphore) -> Callable[..., Any]:
+    """Wrap an async tool so at most `semaphore`'s worth of calls run at once."""
+
+    @functools.wraps(tool)
+    async def limited_tool(*args, **kwargs):
+        async with semaphore:
+            return await tool(*args, **kwargs)
+
+    return limited_tool
+
+
+def tool_manifest(toolset: Iterable[Any]) -> dict:
+    """Describe loaded toolbox tools (name, description, parameters) as plain JSON."""
+    return {
+        tool.__name__: {
+            "description": tool._description,
+            "parameters": [param.model_dump(exclude_none=True) for param in tool._params],
+        }
+        for tool in toolset
+    }
+
+
+def save_manifest(path: str, toolset_name: str, manifest: dict):
+    """Write a toolset manifest snapshot atomically, so readers never see half a file."""
+    partial = f"{path}.tmp"
+    with open(partial, "w") as f:
+        json.dump({"toolset": toolset_name, "tools": manifest}, f, indent=2)
+    os.replace(partial, path)
+
+
+def load_manifest(path: str, toolset_name: str) -> Optional[dict]:
+    """Read a snapshot written by `save_manifest`; None if missing, unreadable or for another toolset."""
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("toolset") != toolset_name:
+        return None
+    return snapshot.get("tools") or None
+
+
+def deferred_tool(connection: "ToolboxConnection", name: str, spec: Mapping[str, Any]) -> Callable[..., Any]:
+    """Build a stand-in for a toolbox tool from its manifest entry.
+
+    The stand-in has the same name, docstring and signature as the tool
+    `ToolboxClient` would build, so ADK declares it identically to the
+    model; the real tool is only fetched from the toolbox on first call.
+    """
+    params = [ParameterSchema.model_validate(param) for param in spec["parameters"]]
+    signature_params = [param.to_param() for param in params]
+    # Same ordering as ToolboxTool: parameters without a default first
+    signature_params.sort(key=lambda param: param.default is not inspect.Parameter.empty)
+
+    async def tool(**kwargs):
+        live_tool = await connection.load_tool(name)
+        return await live_tool(**kwargs)
+
+    tool.__name__ = tool.__qualname__ = name
+    tool.__doc__ = create_func_docstring(spec["description"], params)
+    tool.__signature__ = inspect.Signature(signature_params, return_annotation=str)
+    tool.__annotations__ = {param.name: param.annotation for param in signature_params}
+    return tool
+
+
+class ToolboxConnection:
+    """Async toolbox client shared by every request.
+
+    The client (and its aiohttp session) is created on first use inside the
+    serving event loop rather than at import time, so tool calls never block
+    uvicorn and concurrent sessions share one connection pool.
+    """
+
+    def __init__(self, url: str, client_headers: Optional[Mapping[str, Any]] = None):
+        self.url = url
+        self._client_headers = dict(client_headers or {})
+        self._client: Optional[ToolboxClient] = None
+        self._tools: dict[str, Any] = {}
+
+    @property
+    def client(self) -> ToolboxClient:
+        if self._client is None:
+            self._client = ToolboxClient(
+                self.url, client_headers=self._client_headers)
+        return self._client
+
+    async def load_tool(self, name: str) -> Any:
+        """Load a single tool once and reuse it for every call."""
+        if name not in self._tools:
+            self._tools[name] = await self.client.load_tool(name)
+        return self._tools[name]
+
+    async def load_toolset(self, name: str) -> list:
+        return await self.client.load_toolset(name)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+            self._tools.clear()
+
+
+class SqlToolset(BaseToolset):
+    """ADK toolset that loads a toolbox toolset lazily on the first model request.
+
+    Independent function calls emitted in one model turn are already run
+    concurrently by ADK (and merged in call order); here every backend call
+    also goes through a shared semaphore so a wide fan-out, or many
+    sessions at once, cannot flood the toolbox and Postgres.
+
+    Tools are passed through `wrap` (e.g. the tool-result cache) before
+    being exposed to the model, so cache hits never wait for a slot.
+
+    Loading is retried with exponential backoff (`load_attempts` tries per
+    request); if every attempt fails the request gets no tools and the next
+    request starts over, so a toolbox that comes up late is picked up. With
+    `manifest_path` set, each successful load is snapshotted there, and a
+    cold start with a snapshot serves tools immediately from it while the
+    live manifest is fetched in the background.
+    """
+
+    def __init__(self, connection: ToolboxConnection, toolset_name: str,
+                 wrap: Callable[[Any], Any] = lambda tool: tool,
+                 max_concurrent_calls: int = 8,
+                 manifest_path: Optional[str] = None,
+                 load_attempts: int = 4,
+                 retry_backoff_seconds: float = 0.5,
+                 max_retry_backoff_seconds: float = 8.0):
+        super().__init__()
+        self._connection = connection
+        self._toolset_name = toolset_name
+        self._wrap = wrap
+        self._semaphore = asyncio.Semaphore(max_concurrent_calls)
+        self._manifest_path = manifest_path
+        self._load_attempts = max(1, load_attempts)
+        self._retry_backoff_seconds = retry_backoff_seconds
+        self._max_retry_backoff_seconds = max_retry_backoff_seconds
+        self._tools: Optional[list[BaseTool]] = None
+        self._lock = asyncio.Lock()
+        self._refresh: Optional[asyncio.Task] = None
+        self.fingerprint = ""
+        # "live", "snapshot" or "" while nothing is loaded
+        self.source = ""
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._tools is not None
+
+    def _expose(self, toolbox_tools: list, source: str):
+        self.fingerprint = toolset_fingerprint(toolbox_tools)
+        self._tools = [
+            FunctionTool(self._wrap(limit_concurrency(tool, self._semaphore)))
+            for tool in toolbox_tools
+        ]
+        self.source = source
+
+    async def _load_live(self) -> Optional[list]:
+        """Fetch the toolset manifest, retrying with jittered exponential backoff."""
+        delay = self._retry_backoff_seconds
+        for attempt in range(1, self._load_attempts + 1):
+            try:
+                return await self._connection.load_toolset(self._toolset_name)
+            except Exception:
+                if attempt == self._load_attempts:
+                    logger.exception("Failed to load toolset %s after %d attempts",
+                                     self._toolset_name, attempt)
+                    return None
+                logger.warning("Failed to load toolset %s (attempt %d/%d), retrying in %.1fs",
+                               self._toolset_name, attempt, self._load_attempts, delay)
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, self._max_retry_backoff_seconds)
+        return None
+
+    def _snapshot(self, toolbox_tools: list):
+        if not self._manifest_path:
+            return
+        try:
+            save_manifest(self._manifest_path, self._toolset_name, tool_manifest(toolbox_tools))
+        except Exception:
+            logger.exception("Failed to write toolset manifest to %s", self._manifest_path)
+
+    def _from_snapshot(self) -> Optional[list]:
+        if not self._manifest_path:
+            return None
+        manifest = load_manifest(self._manifest_path, self._toolset_name)
+        if manifest is None:
+            return None
+        try:
+            return [deferred_tool(self._connection, name, spec) for name, spec in manifest.items()]
+        except Exception:
+            logger.exception("Ignoring invalid toolset manifest %s", self._manifest_path)
+            return None
+
+    async def _refresh_from_toolbox(self):
+        toolbox_tools = await self._load_live()
+        if toolbox_tools is not None:
+            self._expose(toolbox_tools, "live")
+            self._snapshot(toolbox_tools)
+        self._refresh = None
+
+    async def get_tools(
+        self, readonly_context: Optional[ReadonlyContext] = None
+    ) -> list[BaseTool]:
+        if self._tools is not None:
+            if self.source == "snapshot" and self._refresh is None:
+                # The last background refresh failed; try again
+                self._refresh = asyncio.create_task(self._refresh_from_toolbox())
+            return self._tools
+        async with self._lock:
+            if self._tools is None:
+                started = time.perf_counter()
+                snapshot_tools = self._from_snapshot()
+                if snapshot_tools is not None:
+                    self._expose(snapshot_tools, "snapshot")
+                    self._refresh = asyncio.create_task(self._refresh_from_toolbox())
+                else:
+                    toolbox_tools = await self._load_live()
+                    if toolbox_tools is None:
+                        return []
+                    self._expose(toolbox_tools, "live")
+                    self._snapshot(toolbox_tools)
+                self.load_seconds = time.perf_counter() - started
+        return self._tools
+
+    async def close(self):
+        if self._refresh is not None:
+            self._refresh.cancel()
+        await self._connection.close()
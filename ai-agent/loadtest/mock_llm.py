@@ -0,0 +1,234 @@
+"""Stand-in for Gemini: replays recorded model turns or synthesizes realistic ones.
+
+After `register()`, model names of the form `mock/<model>` (e.g.
+`GEMINI_QUERY_ANALYST_MODEL_NAME=mock/gemini-2.5-pro`) resolve to `MockLlm`.
+Each model turn is looked up by model, turn step and normalized question:
+
+- `MOCK_LLM_RECORD=turns.jsonl` calls the real `<model>` and appends every
+  turn (content, latency, token counts) to the file. Needs Gemini access.
+- `MOCK_LLM_RECORDINGS=turns.jsonl` replays recorded turns with their
+  recorded latency times `MOCK_LLM_LATENCY_SCALE`.
+- Turns that were not recorded are synthesized: a model with tools calls
+  the tool the intent router would pick (one call per mentioned period
+  for comparisons) and then closes its turn; a model with a response
+  schema answers with a text `FinalPresentation`. Synthetic latency is
+  `MOCK_LLM_FIRST_TOKEN_MS` plus `MOCK_LLM_MS_PER_TOKEN` per output
+  token, jittered by `MOCK_LLM_JITTER`.
+
+Streaming requests get partial text chunks followed by the aggregated
+response, like the Gemini client.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import time
+from datetime import date
+from functools import lru_cache
+from typing import AsyncGenerator
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+MOCK_LLM_RECORDINGS = os.getenv("MOCK_LLM_RECORDINGS")
+MOCK_LLM_RECORD = os.getenv("MOCK_LLM_RECORD")
+MOCK_LLM_LATENCY_SCALE = float(os.getenv("MOCK_LLM_LATENCY_SCALE", "1.0"))
+MOCK_LLM_FIRST_TOKEN_MS = float(os.getenv("MOCK_LLM_FIRST_TOKEN_MS", "450"))
+MOCK_LLM_MS_PER_TOKEN = float(os.getenv("MOCK_LLM_MS_PER_TOKEN", "4"))
+MOCK_LLM_JITTER = float(os.getenv("MOCK_LLM_JITTER", "0.25"))
+MOCK_LLM_SUMMARY_WORDS = int(os.getenv("MOCK_LLM_SUMMARY_WORDS", "120"))
+STREAM_CHUNKS = 4
+
+# Fallback tool per keyword when the router does not route the question
+TOOL_KEYWORDS = [
+    (re.compile(r"\b(customers?|clients?|accounts?|buyers?)\b"), "get-top-customers"),
+    (re.compile(r"\b(regions?|emea|apac|north america|geograph\w*)\b"), "get-sales-by-region"),
+    (re.compile(r"\b(categor\w*|segments?|products?)\b"), "get-sales-by-category"),
+    (re.compile(r"\b(month\w*|trend\w*|over time|seasonal\w*)\b"), "get-monthly-sales-trend"),
+]
+FALLBACK_TOOL = "get-sales-kpis"
+MAX_SYNTHETIC_CALLS = 3
+
+
+def register():
+    """Make `mock/...` model names resolve to `MockLlm`."""
+    LLMRegistry.register(MockLlm)
+
+
+def turn_key(model: str, with_tools: bool, step: int, question: str) -> str:
+    return f"{model}|{'tools' if with_tools else 'text'}|{step}|{' '.join(question.lower().split())}"
+
+
+@lru_cache(maxsize=1)
+def recordings() -> dict[str, dict]:
+    if not MOCK_LLM_RECORDINGS:
+        return {}
+    turns = {}
+    with open(MOCK_LLM_RECORDINGS) as file:
+        for line in file:
+            if line.strip():
+                turn = json.loads(line)
+                turns[turn["key"]] = turn
+    return turns
+
+
+@lru_cache(maxsize=1)
+def question_router():
+    # Imported lazily: the package import builds the agent
+    from corporate_agent.router import QuestionRouter
+    return QuestionRouter(min_confidence=0.0)
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _request_text(llm_request: LlmRequest) -> str:
+    instruction = llm_request.config.system_instruction if llm_request.config else None
+    parts = [instruction if isinstance(instruction, str) else ""]
+    for content in llm_request.contents:
+        parts.extend(json.dumps(part.model_dump(mode="json", exclude_none=True))
+                     for part in content.parts or [])
+    return "".join(parts)
+
+
+def _question_and_step(llm_request: LlmRequest) -> tuple[str, int]:
+    """The latest user question and how many tool rounds followed it."""
+    question, step = "", 0
+    for content in llm_request.contents:
+        parts = content.parts or []
+        if content.role == "user" and any(part.text for part in parts):
+            question = " ".join(part.text for part in parts if part.text)
+            step = 0
+        elif any(part.function_response for part in parts):
+            step += 1
+    return question, step
+
+
+def plan_tool_calls(question: str, available: set[str], today: date) -> list[types.FunctionCall]:
+    """The calls a retriever model would typically make for the question."""
+    route = question_router().route(question, today)
+    if route is not None and route.tool in available:
+        return [types.FunctionCall(name=route.tool, args=route.args)]
+
+    from corporate_agent.router import parse_periods
+    text = " ".join(question.lower().split())
+    periods, _ = parse_periods(text, today)
+    periods = [period for period in periods if period is not None] or [(date(today.year, 1, 1), today)]
+    tool = next((tool for pattern, tool in TOOL_KEYWORDS if pattern.search(text)), FALLBACK_TOOL)
+    if tool not in available:
+        return []
+    calls = []
+    for start, end in periods[:MAX_SYNTHETIC_CALLS]:
+        args = {"start_date": start.isoformat(), "end_date": end.isoformat()}
+        if tool == "get-top-customers":
+            args["limit_count"] = 10
+        calls.append(types.FunctionCall(name=tool, args=args))
+    return calls
+
+
+def synthetic_content(llm_request: LlmRequest, question: str, step: int) -> types.Content:
+    if llm_request.tools_dict:
+        calls = plan_tool_calls(question, set(llm_request.tools_dict), date.today()) if step == 0 else []
+        if calls:
+            return types.Content(role="model", parts=[types.Part(function_call=call) for call in calls])
+        return types.Content(role="model", parts=[types.Part(text="Retrieved the requested data.")])
+
+    words = (f"Here is what the data shows for your question: {question.strip()}").split()
+    filler = "Revenue is concentrated in a few large accounts and peaks toward the end of each quarter.".split()
+    while len(words) < MOCK_LLM_SUMMARY_WORDS:
+        words.extend(filler)
+    text = " ".join(words[:MOCK_LLM_SUMMARY_WORDS])
+    config = llm_request.config
+    if config and (config.response_schema is not None or config.response_json_schema is not None):
+        text = json.dumps({"response_type": "text", "summary_text": text, "vega_lite_spec": None})
+    return types.Content(role="model", parts=[types.Part(text=text)])
+
+
+def _content_tokens(content: types.Content) -> int:
+    return sum(_estimate_tokens(part.text or json.dumps(
+        part.model_dump(mode="json", exclude_none=True))) for part in content.parts or [])
+
+
+class MockLlm(BaseLlm):
+    """Replays or synthesizes model turns; see the module docstring."""
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r"mock/.+"]
+
+    async def _record(self, llm_request: LlmRequest, key: str) -> LlmResponse:
+        from google.adk.models.google_llm import Gemini
+
+        real_model = self.model.split("/", 1)[1]
+        llm_request.model = real_model
+        started = time.perf_counter()
+        response = None
+        async for response in Gemini(model=real_model).generate_content_async(llm_request):
+            pass
+        latency_ms = (time.perf_counter() - started) * 1000
+        if response is not None and response.content is not None:
+            content = response.content.model_copy(deep=True)
+            for part in content.parts or []:
+                # ADK assigns its own call ids on replay
+                if part.function_call:
+                    part.function_call.id = None
+            usage = response.usage_metadata
+            with open(MOCK_LLM_RECORD, "a") as file:
+                file.write(json.dumps({
+                    "key": key,
+                    "content": content.model_dump(mode="json", exclude_none=True),
+                    "latency_ms": round(latency_ms, 1),
+                    "prompt_tokens": usage.prompt_token_count if usage else None,
+                    "output_tokens": usage.candidates_token_count if usage else None,
+                }) + "\n")
+        return response
+
+    async def generate_content_async(
+            self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        question, step = _question_and_step(llm_request)
+        key = turn_key(self.model, bool(llm_request.tools_dict), step, question)
+        if MOCK_LLM_RECORD:
+            yield await self._record(llm_request, key)
+            return
+
+        recorded = recordings().get(key)
+        if recorded is not None:
+            content = types.Content.model_validate(recorded["content"])
+            latency_ms = recorded["latency_ms"] * MOCK_LLM_LATENCY_SCALE
+            prompt_tokens = recorded.get("prompt_tokens") or _estimate_tokens(_request_text(llm_request))
+            output_tokens = recorded.get("output_tokens") or _content_tokens(content)
+        else:
+            if MOCK_LLM_RECORDINGS:
+                logger.debug("No recorded turn for %s; synthesizing one", key)
+            content = synthetic_content(llm_request, question, step)
+            prompt_tokens = _estimate_tokens(_request_text(llm_request))
+            output_tokens = _content_tokens(content)
+            latency_ms = (MOCK_LLM_FIRST_TOKEN_MS + MOCK_LLM_MS_PER_TOKEN * output_tokens) \
+                * random.lognormvariate(0, MOCK_LLM_JITTER)
+        usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens, candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens)
+
+        text = "".join(part.text or "" for part in content.parts or [])
+        if stream and text and not any(part.function_call for part in content.parts or []):
+            # First chunk after the time to first token, the rest spread over generation
+            first_ms = min(latency_ms, MOCK_LLM_FIRST_TOKEN_MS)
+            size = -(-len(text) // STREAM_CHUNKS)
+            await asyncio.sleep(first_ms / 1000)
+            for index in range(0, len(text), size):
+                if index:
+                    await asyncio.sleep((latency_ms - first_ms) / STREAM_CHUNKS / 1000)
+                yield LlmResponse(content=types.Content(
+                    role="model", parts=[types.Part(text=text[index:index + size])]), partial=True)
+        else:
+            await asyncio.sleep(latency_ms / 1000)
+        yield LlmResponse(content=content, usage_metadata=usage,
+                          finish_reason=types.FinishReason.STOP, model_version=self.model)
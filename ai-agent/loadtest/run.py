@@ -0,0 +1,368 @@
+"""Load test: replay a query log against the agent API with a mock LLM and toolbox.
+
+Starts the stand-in toolbox (mock_toolbox.py) and `--instances` agent
+servers (server.py: main.py with `mock/...` models), then replays the
+conversations in `--queries` through the calls the frontend makes (create
+the session, then POST /run_sse with streaming) at each `--concurrency`
+level. No Gemini quota or Cloud SQL instance is used:
+
+    python run.py --concurrency 1,8,32 --output report.json
+    python run.py --concurrency 8 --baseline report.json      # exit 1 on a regression
+    python run.py --agent-url http://localhost:8080 --concurrency 4
+
+Per level the report lists p50/p95/p99 latency of whole answers and of the
+first streamed event, throughput, errors, model and tool calls per
+question (from /metrics) and the peak resident memory of each instance.
+Caches are flushed before every level so levels are comparable; the agent
+otherwise runs with its normal settings, so routed and cached questions
+never reach the mock LLM (`--agent-env ROUTER_ENABLED=False` changes that).
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+LOADTEST_DIR = Path(__file__).resolve().parent
+QUERIES_FILE = LOADTEST_DIR / "queries.jsonl"
+APP_NAME = "corporate_agent"
+MODELS = {
+    "GEMINI_QUERY_ANALYST_MODEL_NAME": "mock/gemini-2.5-pro",
+    "GEMINI_PRESENTER_MODEL_NAME": "mock/gemini-2.5-flash",
+}
+MEMORY_SAMPLE_SECONDS = 0.5
+STARTUP_TIMEOUT_SECONDS = 120
+REQUEST_TIMEOUT_SECONDS = 120
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def load_conversations(path: Path) -> list[list[str]]:
+    """Questions grouped by `conversation`, in log order."""
+    conversations = {}
+    for line in path.read_text().splitlines():
+        if line.strip():
+            entry = json.loads(line)
+            conversations.setdefault(entry.get("conversation", str(len(conversations))), []).append(
+                entry["question"])
+    return list(conversations.values())
+
+
+def start_process(command: list[str], env: dict, log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT, cwd=LOADTEST_DIR)
+
+
+async def wait_until_up(client: httpx.AsyncClient, url: str, process: Optional[subprocess.Popen],
+                        log_path: Optional[Path]):
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            break
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    tail = log_path.read_text()[-2000:] if log_path and log_path.exists() else ""
+    raise RuntimeError(f"{url} did not come up\n{tail}")
+
+
+async def scrape(client: httpx.AsyncClient, agent_url: str) -> dict:
+    """Model calls, tool calls and resident memory from an instance's /metrics."""
+    totals = {"llm_calls": 0.0, "tool_calls": 0.0, "rss_bytes": None}
+    response = await client.get(f"{agent_url}/metrics")
+    for family in text_string_to_metric_families(response.text):
+        for sample in family.samples:
+            if sample.name == "corporate_agent_llm_call_seconds_count":
+                totals["llm_calls"] += sample.value
+            elif sample.name == "corporate_agent_tool_call_seconds_count":
+                totals["tool_calls"] += sample.value
+            elif sample.name == "process_resident_memory_bytes":
+                totals["rss_bytes"] = sample.value
+    return totals
+
+
+async def ask(client: httpx.AsyncClient, agent_url: str, user_id: str, session_id: str,
+              question: str) -> dict:
+    """One question through /run_sse, timed like the frontend sees it."""
+    request = {
+        "appName": APP_NAME,
+        "userId": user_id,
+        "sessionId": session_id,
+        "newMessage": {"role": "user", "parts": [{"text": question}]},
+        "streaming": True,
+    }
+    started = time.perf_counter()
+    first_event, error, answered = None, None, False
+    try:
+        async with client.stream("POST", f"{agent_url}/run_sse", json=request,
+                                 headers={"Accept": "text/event-stream"}) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                if first_event is None:
+                    first_event = time.perf_counter() - started
+                event = json.loads(line[len("data:"):].strip())
+                if "error" in event and "content" not in event:
+                    error = str(event["error"])
+                elif not event.get("partial") and any(
+                        part.get("text") for part in (event.get("content") or {}).get("parts") or []):
+                    answered = True
+    except (httpx.HTTPError, ValueError) as e:
+        error = f"{type(e).__name__}: {e}"
+    if error is None and not answered:
+        error = "no answer"
+    return {"seconds": time.perf_counter() - started, "first_event_seconds": first_event,
+            "error": error}
+
+
+async def replay(client: httpx.AsyncClient, agent_urls: list[str], conversations: list[list[str]],
+                 concurrency: int, think_seconds: float) -> tuple[list[dict], float]:
+    """Replay every conversation in its own session, `concurrency` at a time."""
+    queue = asyncio.Queue()
+    for index, conversation in enumerate(conversations):
+        queue.put_nowait((agent_urls[index % len(agent_urls)], conversation))
+    samples = []
+
+    async def worker():
+        while not queue.empty():
+            agent_url, conversation = queue.get_nowait()
+            user_id, session_id = f"loadtest-{uuid.uuid4().hex[:8]}", uuid.uuid4().hex
+            try:
+                response = await client.post(
+                    f"{agent_url}/apps/{APP_NAME}/users/{user_id}/sessions/{session_id}", json={})
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                samples.extend({"seconds": 0.0, "first_event_seconds": None,
+                                "error": f"session: {e}"} for _ in conversation)
+                continue
+            for turn, question in enumerate(conversation):
+                if turn and think_seconds:
+                    await asyncio.sleep(think_seconds)
+                samples.append(await ask(client, agent_url, user_id, session_id, question))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+async def run_level(client: httpx.AsyncClient, agent_urls: list[str],
+                    conversations: list[list[str]], concurrency: int, think_seconds: float,
+                    flush: bool) -> dict:
+    if flush:
+        for agent_url in agent_urls:
+            await client.post(f"{agent_url}/caches/flush")
+    before = [await scrape(client, agent_url) for agent_url in agent_urls]
+    peak_rss = [sample["rss_bytes"] for sample in before]
+
+    async def sample_memory():
+        while True:
+            await asyncio.sleep(MEMORY_SAMPLE_SECONDS)
+            for index, agent_url in enumerate(agent_urls):
+                rss = (await scrape(client, agent_url))["rss_bytes"]
+                if rss is not None:
+                    peak_rss[index] = max(peak_rss[index] or 0, rss)
+
+    sampler = asyncio.create_task(sample_memory())
+    try:
+        samples, wall_seconds = await replay(client, agent_urls, conversations, concurrency, think_seconds)
+    finally:
+        sampler.cancel()
+    after = [await scrape(client, agent_url) for agent_url in agent_urls]
+
+    ok = [sample for sample in samples if sample["error"] is None]
+    latencies = [sample["seconds"] * 1000 for sample in ok]
+    first_events = [sample["first_event_seconds"] * 1000 for sample in ok]
+    questions = max(len(samples), 1)
+    result = {
+        "concurrency": concurrency,
+        "questions": len(samples),
+        "errors": len(samples) - len(ok),
+        "throughput_qps": len(ok) / wall_seconds,
+        "llm_calls_per_question": sum(a["llm_calls"] - b["llm_calls"] for a, b in zip(after, before)) / questions,
+        "tool_calls_per_question": sum(a["tool_calls"] - b["tool_calls"] for a, b in zip(after, before)) / questions,
+        "peak_rss_mb": [round(rss / 2**20, 1) if rss is not None else None for rss in peak_rss],
+        "error_samples": sorted({sample["error"] for sample in samples if sample["error"]})[:5],
+    }
+    if latencies:
+        result.update({
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "mean_ms": statistics.mean(latencies),
+            "first_event_p50_ms": percentile(first_events, 0.50),
+            "first_event_p95_ms": percentile(first_events, 0.95),
+        })
+    return result
+
+
+def print_report(levels: list[dict]):
+    print(f"\n{'conc':>5} {'questions':>9} {'errors':>6} {'q/s':>7} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'1st p50':>8} {'llm/q':>6} {'tool/q':>6}  peak RSS MB per instance")
+    for level in levels:
+        print(f"{level['concurrency']:>5} {level['questions']:>9} {level['errors']:>6} "
+              f"{level['throughput_qps']:>7.2f} {level.get('p50_ms', 0):>8.0f} {level.get('p95_ms', 0):>8.0f} "
+              f"{level.get('p99_ms', 0):>8.0f} {level.get('first_event_p50_ms', 0):>8.0f} "
+              f"{level['llm_calls_per_question']:>6.2f} {level['tool_calls_per_question']:>6.2f}  "
+              f"{', '.join(str(rss) for rss in level['peak_rss_mb'])}")
+        for error in level["error_samples"]:
+            print(f"      ERROR  {error[:160]}")
+
+
+def regressions(levels: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """Levels that got slower, less throughput, more errors or more memory than the baseline."""
+    previous = {level["concurrency"]: level for level in baseline["levels"]}
+    found = []
+    for level in levels:
+        base = previous.get(level["concurrency"])
+        if base is None:
+            continue
+        name = f"concurrency {level['concurrency']}"
+        for key in ("p95_ms", "p99_ms"):
+            if key in base and level.get(key, math.inf) > base[key] * (1 + tolerance):
+                found.append(f"{name}: {key} {level.get(key, math.inf):.0f} vs {base[key]:.0f}")
+        if level["throughput_qps"] < base["throughput_qps"] * (1 - tolerance):
+            found.append(f"{name}: throughput {level['throughput_qps']:.2f} vs {base['throughput_qps']:.2f} q/s")
+        if level["errors"] > base["errors"]:
+            found.append(f"{name}: errors {level['errors']} vs {base['errors']}")
+        for index, (rss, base_rss) in enumerate(zip(level["peak_rss_mb"], base["peak_rss_mb"])):
+            if rss is not None and base_rss is not None and rss > base_rss * (1 + tolerance):
+                found.append(f"{name}: instance {index} peak RSS {rss} vs {base_rss} MB")
+    return found
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--queries", type=Path, default=QUERIES_FILE,
+                        help="JSONL query log: {\"conversation\": ..., \"question\": ...} per line")
+    parser.add_argument("--concurrency", default="1,4,16",
+                        help="comma-separated numbers of conversations in flight")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="replay the log this many times per level, each in new sessions")
+    parser.add_argument("--think-ms", type=float, default=0.0,
+                        help="pause between the questions of a conversation")
+    parser.add_argument("--instances", type=int, default=1, help="agent servers to start")
+    parser.add_argument("--agent-url", action="append",
+                        help="test running agent instances instead of starting them (repeatable)")
+    parser.add_argument("--agent-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for started agent instances (repeatable)")
+    parser.add_argument("--toolbox-url", help="use a running toolbox instead of mock_toolbox.py")
+    parser.add_argument("--backend", choices=("sqlite", "postgres"), default="sqlite")
+    parser.add_argument("--dsn", help="Postgres connection string for --backend postgres")
+    parser.add_argument("--scale", type=float, default=0.05, help="SQLite data scale")
+    parser.add_argument("--toolbox-latency-ms", type=float, default=5.0,
+                        help="delay added to every tool call of the mock toolbox")
+    parser.add_argument("--recordings", type=Path, help="replay recorded model turns (MOCK_LLM_RECORDINGS)")
+    parser.add_argument("--record", type=Path, help="record real model turns (MOCK_LLM_RECORD)")
+    parser.add_argument("--keep-caches", action="store_true", help="do not flush caches between levels")
+    parser.add_argument("--output", type=Path, help="write the report to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="compare with an earlier --output report")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative change against the baseline")
+    args = parser.parse_args()
+
+    conversations = load_conversations(args.queries) * args.repeat
+    levels = [int(level) for level in args.concurrency.split(",")]
+    processes = []
+    work_dir = Path(tempfile.mkdtemp(prefix="loadtest-"))
+    limits = httpx.Limits(max_connections=max(levels) * 2 + 8)
+    timeout = httpx.Timeout(REQUEST_TIMEOUT_SECONDS, connect=10)
+    try:
+        async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+            agent_urls = args.agent_url
+            if not agent_urls:
+                toolbox_url = args.toolbox_url
+                if not toolbox_url:
+                    port = free_port()
+                    command = [sys.executable, "mock_toolbox.py", "--backend", args.backend,
+                               "--scale", str(args.scale), "--port", str(port),
+                               "--latency-ms", str(args.toolbox_latency_ms),
+                               "--database", str(work_dir / "loadtest.db")]
+                    if args.dsn:
+                        command += ["--dsn", args.dsn]
+                    log_path = work_dir / "toolbox.log"
+                    processes.append(start_process(command, os.environ.copy(), log_path))
+                    toolbox_url = f"http://127.0.0.1:{port}"
+                    await wait_until_up(client, f"{toolbox_url}/stats", processes[-1], log_path)
+
+                agent_urls = []
+                for index in range(args.instances):
+                    port = free_port()
+                    env = {**os.environ, **MODELS,
+                           "ENVIRONMENT": "local",
+                           "MCP_TOOLBOX_SERVICE_URL": toolbox_url,
+                           "SESSION_SERVICE_URI": f"sqlite+aiosqlite:///{work_dir}/sessions-{index}.db",
+                           "TOOL_MANIFEST_PATH": ""}
+                    if args.recordings:
+                        env["MOCK_LLM_RECORDINGS"] = str(args.recordings.resolve())
+                    if args.record:
+                        env["MOCK_LLM_RECORD"] = str(args.record.resolve())
+                    env.update(setting.split("=", 1) for setting in args.agent_env)
+                    log_path = work_dir / f"agent-{index}.log"
+                    processes.append(start_process(
+                        [sys.executable, "server.py", "--port", str(port)], env, log_path))
+                    agent_urls.append(f"http://127.0.0.1:{port}")
+                    await wait_until_up(client, f"{agent_urls[-1]}/ready", processes[-1], log_path)
+
+            # The first session of a fresh session database creates its app state
+            # row, and concurrent first sessions race on it; production never starts empty
+            for agent_url in agent_urls:
+                await client.post(f"{agent_url}/apps/{APP_NAME}/users/loadtest-warmup/sessions", json={})
+            print(f"{len(conversations)} conversations, "
+                  f"{sum(len(conversation) for conversation in conversations)} questions per level "
+                  f"against {len(agent_urls)} instance(s); logs in {work_dir}")
+            results = []
+            for concurrency in levels:
+                results.append(await run_level(client, agent_urls, conversations, concurrency,
+                                               args.think_ms / 1000, not args.keep_caches))
+                print(f"concurrency {concurrency}: done", flush=True)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    print_report(results)
+    report = {"queries": str(args.queries), "repeat": args.repeat, "instances": len(agent_urls),
+              "levels": results}
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nReport written to {args.output}")
+    if args.baseline:
+        found = regressions(results, json.loads(args.baseline.read_text()), args.tolerance)
+        print(f"\n{len(found)} regression(s) against {args.baseline} (tolerance {args.tolerance:.0%})")
+        for line in found:
+            print(f"  {line}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
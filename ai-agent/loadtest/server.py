@@ -0,0 +1,34 @@
+"""Run the agent API from main.py with `mock/...` models served by the mock LLM.
+
+Configured through the same environment as main.py, e.g.:
+
+    ENVIRONMENT=local MCP_TOOLBOX_SERVICE_URL=http://localhost:5000 \\
+    GEMINI_QUERY_ANALYST_MODEL_NAME=mock/gemini-2.5-pro \\
+    GEMINI_PRESENTER_MODEL_NAME=mock/gemini-2.5-flash \\
+        python server.py --port 8080
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import uvicorn
+
+AGENT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AGENT_DIR))
+
+import mock_llm  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    mock_llm.register()
+    from main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
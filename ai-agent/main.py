@@ -1,13 +1,20 @@
 import os
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from google.adk.cli.fast_api import get_fast_api_app
 
 # Get the directory where main.py is located
 AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
-# Note: Use 'sqlite+aiosqlite' instead of 'sqlite' because DatabaseSessionService requires an async driver
-SESSION_SERVICE_URI = "sqlite+aiosqlite:///./sessions.db"
+# Note: Use 'sqlite+aiosqlite' instead of 'sqlite' because DatabaseSessionService requires an async driver.
+# Point this at the shared Postgres (postgresql+asyncpg://...) so every instance sees the same sessions.
+SESSION_SERVICE_URI = os.getenv(
+    "SESSION_SERVICE_URI", "sqlite+aiosqlite:///./sessions.db")
+# Connection pool for database session backends (not used for SQLite)
+SESSION_DB_POOL_SIZE = int(os.getenv("SESSION_DB_POOL_SIZE", "5"))
+SESSION_DB_MAX_OVERFLOW = int(os.getenv("SESSION_DB_MAX_OVERFLOW", "10"))
+SESSION_DB_POOL_RECYCLE_SECONDS = int(
+    os.getenv("SESSION_DB_POOL_RECYCLE_SECONDS", "1800"))
 # Allowed origins for CORS
 ALLOWED_ORIGINS = []
 # No web interface
@@ -16,15 +23,60 @@ SERVE_WEB_INTERFACE = False
 # Enable cloud trace
 ENABLE_CLOUD_TRACE = os.getenv("ENABLE_CLOUD_TRACE", "False").lower() == "true"
 
+
+def get_session_db_kwargs():
+    """Engine options for the session database: a pooled, health-checked pool."""
+    if SESSION_SERVICE_URI.startswith("sqlite"):
+        return None
+    return {
+        "pool_size": SESSION_DB_POOL_SIZE,
+        "max_overflow": SESSION_DB_MAX_OVERFLOW,
+        "pool_recycle": SESSION_DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": True,
+    }
+
+
 # Call the function to get the FastAPI app instance
 # Ensure the agent directory name ('corporate_agent') matches your agent folder
 app: FastAPI = get_fast_api_app(
     agents_dir=AGENT_DIR,
     session_service_uri=SESSION_SERVICE_URI,
+    session_db_kwargs=get_session_db_kwargs(),
     allow_origins=ALLOWED_ORIGINS,
     web=SERVE_WEB_INTERFACE,
-    trace_to_cloud=ENABLE_CLOUD_TRACE  # setup cloud trace
+    trace_to_cloud=ENABLE_CLOUD_TRACE,  # setup cloud trace
+    # Stage, LLM-call and tool latency plus token counts for /metrics
+    extra_plugins=["corporate_agent.metrics.MetricsPlugin"],
 )
 
+
+@app.post("/caches/flush")
+async def flush_caches():
+    """Drop cached answers and tool results, e.g. after re-running init.sql."""
+    # Imported lazily: ADK loads the agent module on first use
+    from corporate_agent.agent import data_version
+    data_version.notify()
+    return {"status": "flushed"}
+
+
+@app.get("/ready")
+async def ready(response: Response):
+    """Readiness/warm-up probe: loads tools, schema and data version; 503 until tools are loaded."""
+    from corporate_agent.agent import warm_up
+    status = await warm_up()
+    if not status["ready"]:
+        response.status_code = 503
+    return status
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage/tool latency, tokens, cache and error counters."""
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+    # Importing the agent registers its caches with the metrics collector
+    import corporate_agent.agent  # noqa: F401
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8080)))
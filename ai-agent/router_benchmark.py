@@ -0,0 +1,81 @@
+"""Accuracy and latency of the intent router on a labeled question set.
+
+Each line of `router_questions.jsonl` holds a question and the tool call
+the router should make (`tool`, `args`), or `"tool": null` when the
+question must go to the retriever LLM. The `dev` split was used to write
+the intent patterns; the `holdout` split was labeled afterwards and never
+tuned against. Relative dates are resolved against a fixed day so the
+labels stay valid:
+
+    python router_benchmark.py [--questions router_questions.jsonl] [--no-similarity]
+
+Reported: coverage (share of routable questions routed correctly), wrong
+routes (routed to the wrong tool or arguments, or routed when the LLM
+was expected) and per-question routing latency.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import types
+from datetime import date
+from pathlib import Path
+
+# Import the router without corporate_agent/__init__.py, which builds the agent
+package = types.ModuleType("corporate_agent")
+package.__path__ = [str(Path(__file__).resolve().parent / "corporate_agent")]
+sys.modules.setdefault("corporate_agent", package)
+
+from corporate_agent.router import QuestionRouter  # noqa: E402
+
+TODAY = date(2025, 6, 15)
+QUESTIONS_FILE = Path(__file__).resolve().parent / "router_questions.jsonl"
+REPEATS = 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--questions", type=Path, default=QUESTIONS_FILE)
+    parser.add_argument("--no-similarity", action="store_true")
+    parser.add_argument("--min-confidence", type=float, default=0.75)
+    args = parser.parse_args()
+
+    router = QuestionRouter(min_confidence=args.min_confidence,
+                            similarity=not args.no_similarity)
+    labeled = [json.loads(line) for line in args.questions.read_text().splitlines() if line.strip()]
+    for split in dict.fromkeys(item.get("split", "all") for item in labeled):
+        report(router, split, [item for item in labeled if item.get("split", "all") == split])
+
+
+def report(router: QuestionRouter, split: str, labeled: list[dict]):
+    routable = [item for item in labeled if item["tool"]]
+    correct, wrong, missed, latencies = 0, [], [], []
+    for item in labeled:
+        started = time.perf_counter()
+        for _ in range(REPEATS):
+            route = router.route(item["question"], TODAY)
+        latencies.append((time.perf_counter() - started) / REPEATS * 1e6)
+        if route is None:
+            if item["tool"]:
+                missed.append(item["question"])
+            continue
+        if route.tool == item["tool"] and route.args == item["args"]:
+            correct += 1
+        else:
+            wrong.append(f"{item['question']!r} -> {route.tool} {route.args} ({route.method})")
+
+    print(f"\n## {split}: {len(labeled)} questions ({len(routable)} routable, "
+          f"{len(labeled) - len(routable)} for the LLM)")
+    print(f"routed correctly: {correct}/{len(routable)} ({correct / max(len(routable), 1):.0%} coverage)")
+    print(f"wrong routes: {len(wrong)}  (precision {correct / max(correct + len(wrong), 1):.1%})")
+    print(f"router latency: median {statistics.median(latencies):.0f} us, "
+          f"max {max(latencies):.0f} us per question")
+    for line in wrong:
+        print(f"  WRONG  {line}")
+    for question in missed:
+        print(f"  LLM    {question!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Custom ADK services, registered when `get_fast_api_app` loads this module.
+
+Database-backed sessions use `CompactingSessionService`, which prunes old
+turns so loading a session stays flat however long the conversation runs
+and however large its turns are.
+"""
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Optional
+
+from google.adk.cli.service_registry import get_service_registry
+from google.adk.events.event import Event
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.adk.sessions.database_session_service import DatabaseSessionService, StorageEvent
+from google.adk.sessions.session import Session
+from sqlalchemy import Index, Text, cast, delete, func, select
+
+logger = logging.getLogger(__name__)
+
+SESSION_HISTORY_MAX_TURNS = int(os.getenv("SESSION_HISTORY_MAX_TURNS", "20"))
+SESSION_HISTORY_MAX_AGE_SECONDS = float(
+    os.getenv("SESSION_HISTORY_MAX_AGE_SECONDS", "604800"))
+SESSION_HISTORY_MAX_BYTES = int(os.getenv("SESSION_HISTORY_MAX_BYTES", "262144"))
+
+# Session loads filter on these columns and order by timestamp; the events
+# primary key leads with the event id and cannot serve them.
+_EVENTS_BY_SESSION = Index(
+    "ix_events_session_timestamp",
+    StorageEvent.app_name,
+    StorageEvent.user_id,
+    StorageEvent.session_id,
+    StorageEvent.timestamp,
+)
+
+
+class CompactingSessionService(DatabaseSessionService):
+    """`DatabaseSessionService` that keeps only the most recent turns of a session.
+
+    Whenever a new user message is appended, events from turns beyond the last
+    `max_turns`, that started more than `max_age_seconds` ago, or that would
+    take the stored content and actions of the retained turns past
+    `max_bytes`, are deleted. The latest turn is always kept. Pruning always
+    cuts at the start of a turn, so a tool call is never separated from its
+    response. Session state is kept in full.
+    """
+
+    def __init__(self, db_url: str, max_turns: int = 20,
+                 max_age_seconds: float = 0.0, max_bytes: int = 0, **kwargs: Any):
+        super().__init__(db_url, **kwargs)
+        self.max_turns = max_turns
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.pruned_events = 0
+        self._index_created = False
+
+    async def _ensure_index(self):
+        if self._index_created:
+            return
+        await self._ensure_tables_created()
+        async with self.db_engine.begin() as conn:
+            await conn.run_sync(
+                lambda sync_conn: _EVENTS_BY_SESSION.create(sync_conn, checkfirst=True))
+        self._index_created = True
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str,
+                          config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        await self._ensure_index()
+        return await super().get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session=session, event=event)
+        if event.author == "user" and not event.partial:
+            await self.prune(session.app_name, session.user_id, session.id)
+        return event
+
+    async def prune(self, app_name: str, user_id: str, session_id: str) -> int:
+        """Delete events older than the retained turns; returns how many were removed."""
+        await self._ensure_index()
+        in_session = (
+            StorageEvent.app_name == app_name,
+            StorageEvent.user_id == user_id,
+            StorageEvent.session_id == session_id,
+        )
+        turn_starts = select(StorageEvent.timestamp).where(
+            *in_session, StorageEvent.author == "user")
+        async with self.database_session_factory() as sql_session:
+            cutoffs = []
+            if self.max_turns > 0:
+                cutoffs.append(await sql_session.scalar(
+                    turn_starts.order_by(StorageEvent.timestamp.desc())
+                    .offset(self.max_turns - 1).limit(1)))
+            if self.max_age_seconds > 0:
+                oldest = datetime.fromtimestamp(time.time() - self.max_age_seconds)
+                cutoffs.append(await sql_session.scalar(
+                    select(func.min(StorageEvent.timestamp)).where(
+                        *in_session, StorageEvent.author == "user",
+                        StorageEvent.timestamp >= oldest)))
+            if self.max_bytes > 0:
+                cutoffs.append(await self._size_cutoff(sql_session, in_session))
+            cutoffs = [cutoff for cutoff in cutoffs if cutoff is not None]
+            if not cutoffs:
+                return 0
+            result = await sql_session.execute(
+                delete(StorageEvent).where(
+                    *in_session, StorageEvent.timestamp < max(cutoffs)))
+            await sql_session.commit()
+        removed = result.rowcount or 0
+        if removed:
+            self.pruned_events += removed
+            logger.debug("Pruned %d events from session %s", removed, session_id)
+        return removed
+
+    async def _size_cutoff(self, sql_session, in_session) -> Optional[datetime]:
+        """Start of the oldest turn that keeps the retained events within `max_bytes`."""
+        # Sizes are computed in the database, so no event bodies are loaded
+        size = (func.coalesce(func.length(cast(StorageEvent.content, Text)), 0)
+                + func.coalesce(func.length(StorageEvent.actions), 0))
+        rows = await sql_session.execute(
+            select(StorageEvent.timestamp, StorageEvent.author, size)
+            .where(*in_session).order_by(StorageEvent.timestamp.desc()))
+        total, cutoff = 0, None
+        for timestamp, author, event_bytes in rows:
+            total += event_bytes
+            if author != "user":
+                continue
+            if cutoff is not None and total > self.max_bytes:
+                break
+            cutoff = timestamp
+        return cutoff
+
+
+def compacting_session_factory(uri: str, **kwargs):
+    kwargs.pop("agents_dir", None)
+    return CompactingSessionService(
+        db_url=uri,
+        max_turns=SESSION_HISTORY_MAX_TURNS,
+        max_age_seconds=SESSION_HISTORY_MAX_AGE_SECONDS,
+        max_bytes=SESSION_HISTORY_MAX_BYTES,
+        **kwargs,
+    )
+
+
+for _scheme in ("sqlite+aiosqlite", "postgresql+asyncpg"):
+    get_service_registry().register_session_service(_scheme, compacting_session_factory)
@@ -0,0 +1,6 @@
+-- Separate role and database for the agent's session store, so session
+-- tables and their write load stay out of the business database (mcpdb).
+-- Docker Compose mounts this into the Postgres init directory; it only runs
+-- when the data volume is first created.
+CREATE ROLE sessionsuser LOGIN PASSWORD 'sessionspassword';
+CREATE DATABASE agent_sessions OWNER sessionsuser;
@@ -0,0 +1,76 @@
+"""Cold-start latency: agent import, tools ready and first tool result.
+
+Each sample runs in a fresh interpreter, like a new Cloud Run instance, once
+loading the toolset from the toolbox and once booting from a manifest
+snapshot. Run it against a running toolbox, e.g.:
+
+    ENVIRONMENT=local MCP_TOOLBOX_SERVICE_URL=http://localhost:5000 \\
+        python startup_benchmark.py
+
+"first result" is the first `get-sales-kpis` call after tools are ready,
+i.e. the point from which the retriever can answer; model latency is not
+included.
+"""
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SAMPLES = int(os.getenv("BENCHMARK_SAMPLES", "5"))
+FIRST_TOOL = "get-sales-kpis"
+FIRST_TOOL_ARGS = {"start_date": "2024-01-01", "end_date": "2024-12-31"}
+
+
+async def cold_start(started: float) -> dict:
+    from corporate_agent.agent import sql_toolset
+    imported = time.perf_counter()
+    tools = {tool.name: tool for tool in await sql_toolset.get_tools()}
+    ready = time.perf_counter()
+    await tools[FIRST_TOOL].func(**FIRST_TOOL_ARGS)
+    answered = time.perf_counter()
+    await sql_toolset.close()
+    return {
+        "source": sql_toolset.source,
+        "import_ms": (imported - started) * 1000,
+        "tools_ready_ms": (ready - started) * 1000,
+        "first_result_ms": (answered - started) * 1000,
+    }
+
+
+def run_child() -> dict:
+    """Spawn a fresh interpreter and return its timings."""
+    output = subprocess.run(
+        [sys.executable, __file__, "--child"], check=True,
+        capture_output=True, text=True, env=os.environ.copy()).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(label: str, manifest_path: str = ""):
+    os.environ["TOOL_MANIFEST_PATH"] = manifest_path
+    samples = [run_child() for _ in range(SAMPLES)]
+    print(f"{label:<10} {samples[-1]['source']:<9}" + "".join(
+        f" {statistics.median(sample[key] for sample in samples):>14.1f}"
+        for key in ("import_ms", "tools_ready_ms", "first_result_ms")))
+
+
+def main():
+    print(f"{'mode':<10} {'source':<9} {'import ms':>14} {'tools ready ms':>14} {'1st result ms':>14}")
+    measure("live")
+    with tempfile.TemporaryDirectory() as directory:
+        manifest_path = os.path.join(directory, "ecommerce-toolset.json")
+        # The first sample loads live and writes the snapshot the others boot from
+        os.environ["TOOL_MANIFEST_PATH"] = manifest_path
+        run_child()
+        measure("snapshot", manifest_path)
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        started = time.perf_counter()
+        print(json.dumps(asyncio.run(cold_start(started))))
+    else:
+        main()
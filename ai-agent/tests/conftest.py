@@ -0,0 +1,178 @@
+"""Runs the real agent pipeline against a stub toolbox and stub models.
+
+The environment is set before `corporate_agent` is imported, so the
+agent module picks up the stub model names and never needs Gemini or a
+toolbox server. Run from `ai-agent/` with `python -m pytest tests`.
+"""
+import asyncio
+import json
+import os
+import sys
+from collections import Counter
+from typing import AsyncGenerator, Callable, Optional
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.update({
+    "ENVIRONMENT": "local",
+    "MCP_TOOLBOX_SERVICE_URL": "http://toolbox.invalid",
+    "GEMINI_QUERY_ANALYST_MODEL_NAME": "stub/retriever",
+    "GEMINI_PRESENTER_MODEL_NAME": "stub/presenter",
+    "QUESTION_COALESCE_TIMEOUT_SECONDS": "10",
+})
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+from google.adk.runners import InMemoryRunner
+from google.adk.sessions import Session
+from google.genai import types
+
+REGION_ROWS = [
+    {"region": "North America", "revenue": 5200.0, "orders": 52},
+    {"region": "EMEA", "revenue": 3100.0, "orders": 31},
+    {"region": "APAC", "revenue": 1700.0, "orders": 17},
+]
+
+
+class StubToolbox:
+    """Answers toolbox tool calls from canned rows and counts them."""
+
+    def __init__(self):
+        self.calls: Counter = Counter()
+        self.latency_seconds = 0.05
+
+    def _tool(self, name: str, doc: str, rows: Callable[..., list]):
+        async def tool(start_date: str, end_date: str):
+            self.calls[name] += 1
+            await asyncio.sleep(self.latency_seconds)
+            return json.dumps(rows(start_date, end_date))
+
+        tool.__name__ = name
+        tool.__doc__ = f"{doc}\n\nArgs:\n    start_date (str): First day, YYYY-MM-DD.\n" \
+                       "    end_date (str): Last day, YYYY-MM-DD."
+        return tool
+
+    async def load_toolset(self, name: str) -> list:
+        return [
+            self._tool("get-sales-by-region", "Revenue and orders per region.",
+                       lambda start, end: REGION_ROWS),
+            self._tool("get-sales-kpis", "Revenue, orders and customers for a period.",
+                       lambda start, end: [{"revenue": 10000.0, "orders": 100, "customers": 40}]),
+        ]
+
+    async def load_tool(self, name: str):
+        async def version(**kwargs):
+            return json.dumps([{"version": "1"}])
+
+        return version
+
+    async def close(self):
+        pass
+
+
+# Model calls per model name; question -> (tool, extra args) for the retriever;
+# exceptions the next model calls raise
+model_calls: Counter = Counter()
+model_plan: dict = {}
+model_failures: list = []
+
+
+class StubLlm(BaseLlm):
+    """Retriever: calls the tool `model_plan` names for the question; presenter: a text answer."""
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r"stub/.+"]
+
+    async def generate_content_async(
+            self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        model_calls[self.model] += 1
+        await asyncio.sleep(0.05)
+        if model_failures:
+            raise model_failures.pop()
+        last = llm_request.contents[-1]
+        answered = any(part.function_response for part in last.parts or [])
+        if llm_request.tools_dict and not answered:
+            question = " ".join(part.text for part in last.parts or [] if part.text)
+            tool, args = model_plan.get(question, ("get-sales-kpis", {}))
+            args = {"start_date": "2024-01-01", "end_date": "2024-12-31", **args}
+            parts = [types.Part(function_call=types.FunctionCall(name=tool, args=args))]
+        elif llm_request.tools_dict:
+            parts = [types.Part(text="Retrieved the requested data.")]
+        else:
+            parts = [types.Part(text=json.dumps(
+                {"response_type": "text", "summary_text": "Here are the numbers.", "vega_lite_spec": None}))]
+        yield LlmResponse(content=types.Content(role="model", parts=parts))
+
+
+LLMRegistry.register(StubLlm)
+
+from corporate_agent import agent  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def toolbox(monkeypatch) -> StubToolbox:
+    stub = StubToolbox()
+    for name in ("load_toolset", "load_tool", "close"):
+        monkeypatch.setattr(agent.toolbox_connection, name, getattr(stub, name))
+    # Every test starts from an empty toolset, cache and model log
+    monkeypatch.setattr(agent.sql_toolset, "_tools", None)
+    agent.data_version.notify()
+    model_calls.clear()
+    model_plan.clear()
+    model_failures.clear()
+    return stub
+
+
+@pytest.fixture
+def runner() -> InMemoryRunner:
+    return InMemoryRunner(agent=agent.root_agent, app_name="corporate_agent")
+
+
+@pytest.fixture
+def session(loop, runner) -> Callable[..., Session]:
+    def get(user_id: str, session_id: str) -> Session:
+        return loop.run_until_complete(runner.session_service.get_session(
+            app_name="corporate_agent", user_id=user_id, session_id=session_id))
+
+    return get
+
+
+@pytest.fixture
+def ask(loop, runner) -> Callable[..., str]:
+
+    async def ask_one(question: str, user_id: str = "user", session_id: Optional[str] = None) -> str:
+        session = None
+        if session_id is not None:
+            session = await runner.session_service.get_session(
+                app_name="corporate_agent", user_id=user_id, session_id=session_id)
+        if session is None:
+            session = await runner.session_service.create_session(
+                app_name="corporate_agent", user_id=user_id, session_id=session_id)
+        text = ""
+        async for event in runner.run_async(
+                user_id=user_id, session_id=session.id,
+                new_message=types.Content(role="user", parts=[types.Part(text=question)])):
+            if event.content and event.content.parts and event.content.parts[0].text:
+                text = event.content.parts[0].text
+        return text
+
+    def run(*questions, **kwargs):
+        """Ask the questions concurrently (as separate users unless given) and return the answers."""
+        async def all_of():
+            return await asyncio.gather(*(
+                ask_one(question, **{"user_id": f"user-{index}", **kwargs})
+                for index, question in enumerate(questions)), return_exceptions=True)
+        return loop.run_until_complete(all_of())
+
+    return run
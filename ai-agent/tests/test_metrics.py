@@ -0,0 +1,53 @@
+import pytest
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from conftest import model_failures
+from corporate_agent import agent
+from corporate_agent.metrics import MetricsPlugin
+
+
+@pytest.fixture
+def plugin() -> MetricsPlugin:
+    return MetricsPlugin()
+
+
+@pytest.fixture
+def runner(plugin) -> InMemoryRunner:
+    return InMemoryRunner(agent=agent.root_agent, app_name="corporate_agent", plugins=[plugin])
+
+
+@pytest.fixture(autouse=True)
+def retriever_only(monkeypatch):
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", False)
+
+
+def test_completed_run_leaves_no_timers(toolbox, ask, plugin):
+    answers = ask("What was the revenue in 2024?")
+
+    assert not [answer for answer in answers if isinstance(answer, BaseException)]
+    assert not plugin._started
+
+
+def test_failed_run_leaves_no_timers(toolbox, ask, plugin):
+    model_failures.append(RuntimeError("model unavailable"))
+
+    answers = ask("What was the revenue in 2024?")
+
+    assert isinstance(answers[0], RuntimeError)
+    assert not plugin._started
+
+
+def test_abandoned_run_leaves_no_timers(toolbox, loop, runner, plugin):
+    async def first_event():
+        session = await runner.session_service.create_session(app_name="corporate_agent", user_id="user")
+        events = runner.run_async(
+            user_id="user", session_id=session.id,
+            new_message=types.Content(role="user", parts=[types.Part(text="What was the revenue in 2024?")]))
+        # A client that disconnects after the first event closes the run mid-stream
+        await anext(events)
+        await events.aclose()
+
+    loop.run_until_complete(first_event())
+
+    assert not plugin._started
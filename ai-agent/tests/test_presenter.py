@@ -0,0 +1,12 @@
+import json
+
+from corporate_agent.presenter import monthly_trend
+
+
+def test_monthly_trend_reads_months_as_utc():
+    rows = [{"month_str": "2024-01", "revenue": 100.0}, {"month_str": "2024-02", "revenue": 120.0}]
+
+    spec = json.loads(monthly_trend({}, rows).vega_lite_spec)
+
+    assert spec["encoding"]["x"]["timeUnit"] == "utcyearmonth"
+    assert {field["timeUnit"] for field in spec["encoding"]["tooltip"] if "timeUnit" in field} == {"utcyearmonth"}
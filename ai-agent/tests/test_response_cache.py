@@ -0,0 +1,131 @@
+import time
+from datetime import date
+
+import pytest
+
+from conftest import model_calls, model_failures, model_plan
+from corporate_agent import agent
+from corporate_agent.router import question_fingerprint
+
+QUESTION = "What was the revenue by region in 2024?"
+
+
+@pytest.fixture(params=[True, False], ids=["routed", "retriever"])
+def router_enabled(request, monkeypatch):
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", request.param)
+    return request.param
+
+
+def test_concurrent_identical_questions_call_backend_once(toolbox, ask, router_enabled):
+    model_plan[QUESTION] = ("get-sales-by-region", {})
+
+    answers = ask(*[QUESTION] * 8)
+
+    assert not [answer for answer in answers if isinstance(answer, BaseException)]
+    assert toolbox.calls == {"get-sales-by-region": 1}
+    # One retriever run: the tool call, then the turn closing after its result
+    assert model_calls["stub/retriever"] == (0 if router_enabled else 2)
+
+
+def test_failed_leader_releases_waiters(toolbox, ask, monkeypatch):
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", False)
+    model_plan[QUESTION] = ("get-sales-by-region", {})
+    model_failures.append(RuntimeError("model unavailable"))
+
+    started = time.perf_counter()
+    answers = ask(*[QUESTION] * 4)
+
+    # The leader's error reaches its own caller; the waiters do not sit out the timeout
+    assert len([answer for answer in answers if isinstance(answer, RuntimeError)]) == 1
+    assert time.perf_counter() - started < agent.QUESTION_COALESCE_TIMEOUT_SECONDS
+    assert not agent.response_cache._in_flight
+    assert not agent.response_cache._leaders
+    assert not agent.response_cache._pending
+
+
+def hits() -> int:
+    return agent.response_cache.stats()["hits"]
+
+
+def test_reworded_routed_question_hits(toolbox, ask, monkeypatch):
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", True)
+    before = hits()
+
+    ask("Revenue by region in 2024")
+    ask("Show me sales per region for 2024")
+
+    assert hits() == before + 1
+    assert toolbox.calls == {"get-sales-by-region": 1}
+
+
+def test_same_words_hit_without_router(toolbox, ask, monkeypatch):
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", False)
+
+    ask("What was the revenue in 2024?")
+    ask("revenue 2024")
+
+    assert model_calls["stub/retriever"] == 2
+
+
+def test_different_questions_miss(toolbox, ask, monkeypatch):
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", False)
+    before = hits()
+
+    ask("How many sales in 2024?")
+    ask("What is the revenue in 2024?")
+    ask("What is the revenue in 2023?")
+
+    assert hits() == before
+    assert model_calls["stub/retriever"] == 6
+
+
+def test_question_during_startup_is_stored_under_its_lookup_key(toolbox, ask, loop, monkeypatch):
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", False)
+    # Nothing loaded yet, as on the first question after a cold start
+    monkeypatch.setattr(agent.sql_toolset, "fingerprint", "")
+
+    ask(QUESTION)
+
+    key = loop.run_until_complete(agent.response_cache.make_key(QUESTION))
+    assert key.startswith(agent.sql_toolset.fingerprint + ":") and agent.sql_toolset.fingerprint
+    assert loop.run_until_complete(agent.response_cache.lookup(key)) is not None
+
+
+def test_nothing_is_cached_without_a_toolset_fingerprint(toolbox, ask, monkeypatch):
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", False)
+
+    async def no_fingerprint():
+        return ""
+
+    monkeypatch.setattr(agent.response_cache, "_tool_fingerprint", no_fingerprint)
+
+    ask(QUESTION)
+    ask(QUESTION)
+
+    assert model_calls["stub/retriever"] == 4
+
+
+def test_relative_periods_resolve_to_dates():
+    may, june = date(2025, 5, 10), date(2025, 6, 10)
+
+    assert question_fingerprint("revenue last month", may) != question_fingerprint("revenue last month", june)
+    assert question_fingerprint("revenue last month", june) == question_fingerprint("revenue in May 2025", june)
+    assert question_fingerprint("how many sales in 2024", june) != question_fingerprint("revenue in 2024", june)
+
+
+@pytest.mark.parametrize("question, other", [
+    ("top 5 customers for product 10", "top 10 customers for product 5"),
+    ("Which products did Acme buy from Globex?", "Which products did Globex buy from Acme?"),
+    ("customers who bought laptops but not phones", "customers who bought phones but not laptops"),
+])
+def test_reordered_words_are_different_questions(question, other):
+    today = date(2025, 6, 10)
+
+    assert question_fingerprint(question, today) != question_fingerprint(other, today)
+
+
+def test_wording_variants_share_a_key():
+    today = date(2025, 6, 10)
+
+    assert question_fingerprint("Show me our biggest clients in 2024", today) \
+        == question_fingerprint("top customer 2024", today)
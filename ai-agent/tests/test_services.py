@@ -0,0 +1,29 @@
+import pytest
+from google.adk.events.event import Event
+from google.genai import types
+
+from services import CompactingSessionService
+
+
+def text_event(author: str, invocation: int, text: str) -> Event:
+    return Event(author=author, invocation_id=f"turn-{invocation}",
+                 content=types.Content(role="user" if author == "user" else "model",
+                                       parts=[types.Part(text=text)]))
+
+
+@pytest.mark.parametrize("max_bytes, kept_turns", [(0, 6), (5000, 2), (100, 1)])
+def test_prunes_turns_beyond_size_budget(loop, tmp_path, max_bytes, kept_turns):
+    service = CompactingSessionService(
+        f"sqlite+aiosqlite:///{tmp_path / 'sessions.db'}", max_turns=0, max_bytes=max_bytes)
+
+    async def converse():
+        session = await service.create_session(app_name="app", user_id="user")
+        for turn in range(6):
+            await service.append_event(session, text_event("user", turn, f"question {turn}"))
+            await service.append_event(session, text_event("corporate_agent", turn, "x" * 2000))
+        return await service.get_session(app_name="app", user_id="user", session_id=session.id)
+
+    session = loop.run_until_complete(converse())
+
+    turns = [event.content.parts[0].text for event in session.events if event.author == "user"]
+    assert turns == [f"question {turn}" for turn in range(6 - kept_turns, 6)]
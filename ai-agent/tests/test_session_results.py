@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from conftest import model_calls, model_plan
+from corporate_agent import agent
+from corporate_agent.session_results import (
+    STATE_LAST_RESULTS, STATE_RESULT_PREFIX, is_follow_up, result_ref)
+
+REGION_QUESTION = "Revenue by region in 2024"
+REGION_ARGS = {"start_date": "2024-01-01", "end_date": "2024-12-31"}
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("Show revenue by region as a table", False),
+    ("What is this year's revenue?", False),
+    ("Which customers that spent the most in 2024?", False),
+    ("as a pie chart", True),
+    ("show it as a table please", True),
+    ("only EMEA", True),
+    ("what about APAC?", True),
+    ("sort those descending", True),
+    ("top 3 of them", True),
+    ("show that as a pie chart", True),
+    ("What about revenue by category as a table?", True),
+])
+def test_is_follow_up(question, expected):
+    assert is_follow_up(question) is expected
+
+
+def test_first_question_with_form_is_cached(toolbox, ask, monkeypatch):
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", False)
+
+    ask("Show revenue by region as a table")
+    ask("Show revenue by region as a table")
+
+    assert model_calls["stub/retriever"] == 2
+
+
+def test_cache_hit_restores_previous_results(toolbox, ask, session, monkeypatch):
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", True)
+    ask(REGION_QUESTION, user_id="first", session_id="first")
+
+    ask(REGION_QUESTION, user_id="second", session_id="second")
+    ask("only EMEA", user_id="second", session_id="second")
+
+    assert toolbox.calls == {"get-sales-by-region": 1}
+    last = agent.session_results.last_results(session("second", "second").state)
+    assert [row[0] for row in last[0]["result"]["rows"]] == ["EMEA"]
+
+
+def test_form_only_follow_up_reuses_previous_results(toolbox, ask, session, monkeypatch):
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", False)
+    model_plan[REGION_QUESTION] = ("get-sales-by-region", {})
+    ask(REGION_QUESTION, user_id="user", session_id="form")
+
+    ask("show that as a pie chart", user_id="user", session_id="form")
+
+    assert toolbox.calls == {"get-sales-by-region": 1}
+    assert model_calls["stub/retriever"] == 2
+    last = agent.session_results.last_results(session("user", "form").state)
+    assert [entry["tool"] for entry in last] == ["get-sales-by-region"]
+
+
+@pytest.mark.parametrize("question", [
+    "What about revenue by category as a table?",
+    "now show revenue by category as a bar chart",
+    "and top customers as a table",
+])
+def test_new_question_with_form_is_answered_afresh(toolbox, ask, session, monkeypatch, question):
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", False)
+    model_plan[REGION_QUESTION] = ("get-sales-by-region", {})
+    ask(REGION_QUESTION, user_id="user", session_id="topic")
+
+    ask(question, user_id="user", session_id="topic")
+
+    assert toolbox.calls == {"get-sales-by-region": 1, "get-sales-kpis": 1}
+    last = agent.session_results.last_results(session("user", "topic").state)
+    assert [entry["tool"] for entry in last] == ["get-sales-kpis"]
+
+
+def test_turn_writes_only_new_results(toolbox, ask, session, monkeypatch):
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", True)
+    ask(REGION_QUESTION, user_id="user", session_id="deltas")
+    turns = len(session("user", "deltas").events)
+
+    ask("Total revenue in 2024", user_id="user", session_id="deltas")
+
+    events = session("user", "deltas").events[turns:]
+    written = {key for event in events for key in event.actions.state_delta}
+    assert STATE_RESULT_PREFIX + result_ref("get-sales-by-region", REGION_ARGS) not in written
+    assert STATE_RESULT_PREFIX + result_ref("get-sales-kpis", REGION_ARGS) in written
+    last = session("user", "deltas").state[STATE_LAST_RESULTS]
+    assert len(json.dumps(last)) < 100
+
+
+def test_data_change_drops_session_results(toolbox, ask, monkeypatch):
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", False)
+    ask(REGION_QUESTION, user_id="user", session_id="flush")
+
+    agent.data_version.notify()
+    ask(REGION_QUESTION, user_id="user", session_id="flush")
+
+    assert toolbox.calls["get-sales-kpis"] == 2
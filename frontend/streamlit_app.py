@@ -1,12 +1,71 @@
+import json
 import random
+import re
+import threading
 import time
 import os
 import requests
+from google.auth import jwt
 from google.auth.transport.requests import Request
 from google.oauth2 import id_token
 
 import streamlit as st
 
+# Messages shown per page of history; "Show earlier messages" reveals another page
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+# Charts of the most recent answers are drawn; older ones are drawn on demand
+LIVE_CHART_COUNT = int(os.getenv("LIVE_CHART_COUNT", "3"))
+# Larger data.values arrays are reduced before they reach the browser
+MAX_CHART_POINTS = int(os.getenv("MAX_CHART_POINTS", "500"))
+
+
+class IdTokenCache:
+    """Caches a Google ID token and fetches a new one shortly before it expires.
+
+    The agent has a fuller version (ai-agent/corporate_agent/auth.py) that
+    refreshes in the background; one inline fetch per hour is fine here.
+    """
+
+    def __init__(self, audience: str, refresh_margin_seconds: float = 300.0):
+        self.audience = audience
+        self._refresh_margin_seconds = refresh_margin_seconds
+        self._request = Request(session=requests.Session())
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0.0
+
+    def get(self) -> str:
+        with self._lock:
+            if self._token is None or self._expires_at - time.time() < self._refresh_margin_seconds:
+                self._token = id_token.fetch_id_token(self._request, self.audience)
+                self._expires_at = float(jwt.decode(self._token, verify=False).get("exp", 0))
+            return self._token
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """One keep-alive connection pool to the AI agent shared by every rerun and user."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource
+def get_id_token_cache(audience: str) -> IdTokenCache:
+    return IdTokenCache(audience)
+
+
+def get_request_headers(ai_agent_url: str) -> dict:
+    """Build request headers, attaching a cached ID token when one is available."""
+    try:
+        token = get_id_token_cache(ai_agent_url).get()
+        return {"Authorization": f"Bearer {token}",
+                "Content-Type": "application/json"}
+    except Exception:
+        return {"Content-Type": "application/json"}
+
 
 def get_user_id():
     """Generate a persistent user ID that survives browser refreshes."""
@@ -34,7 +93,7 @@ def ensure_user_session(ai_agent_url: str, user_id: str, session_id: str, header
 
     try:
         session_url = f"{ai_agent_url}/apps/corporate_agent/users/{user_id}/sessions/{session_id}"
-        response = requests.post(
+        response = get_http_session().post(
             session_url,
             json={"stateDelta": {"type": "anonymous"}},
             headers=headers,
@@ -55,8 +114,8 @@ def ensure_user_session(ai_agent_url: str, user_id: str, session_id: str, header
         return False
 
 
-def generate_ai_response(prompt: str):
-    """Generate AI response by calling the AI agent service with ADK format."""
+def stream_ai_response(prompt: str):
+    """Yield ADK events from the AI agent's server-sent-events endpoint as they arrive."""
     ai_agent_url = os.getenv("AI_AGENT_URL")
     if not ai_agent_url:
         raise ValueError("AI_AGENT_URL environment variable is required")
@@ -64,15 +123,10 @@ def generate_ai_response(prompt: str):
     user_id = get_user_id()
     session_id = get_session_id()
 
-    try:
-        token = id_token.fetch_id_token(Request(), ai_agent_url)
-        headers = {"Authorization": f"Bearer {token}",
-                   "Content-Type": "application/json"}
-    except Exception:
-        headers = {"Content-Type": "application/json"}
+    headers = get_request_headers(ai_agent_url)
 
     if not ensure_user_session(ai_agent_url, user_id, session_id, headers):
-        return {"error": "Failed to create user session"}
+        raise RuntimeError("Failed to create user session")
 
     # Prepare ADK request format
     adk_request = {
@@ -85,71 +139,193 @@ def generate_ai_response(prompt: str):
                 "text": prompt
             }]
         },
+        "streaming": True,
     }
 
-    try:
-        response = requests.post(
-            f"{ai_agent_url}/run",
-            json=adk_request,
-            headers=headers,
-            timeout=60
-        )
+    # The read timeout applies between events, not to the whole answer
+    with get_http_session().post(
+        f"{ai_agent_url}/run_sse",
+        json=adk_request,
+        headers={**headers, "Accept": "text/event-stream"},
+        stream=True,
+        timeout=(10, 60)
+    ) as response:
         response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        st.error(f"Failed to get AI response: {e}")
-        return {"error": str(e)}
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            event = json.loads(line[len("data:"):].strip())
+            if "error" in event and "content" not in event:
+                raise RuntimeError(event["error"])
+            yield event
+
+
+def extract_partial_json_string(text: str, key: str):
+    """Return the (possibly unfinished) string value of `key` from partial JSON text."""
+    match = re.search(r'"%s"\s*:\s*"' % re.escape(key), text)
+    if not match:
+        return None
+    chars = []
+    i = match.end()
+    while i < len(text):
+        char = text[i]
+        if char == '"':
+            break
+        if char == "\\":
+            escape = text[i:i + 6] if text[i + 1:i + 2] == "u" else text[i:i + 2]
+            if len(escape) < 2 or (escape[1] == "u" and len(escape) < 6):
+                break  # escape sequence not fully streamed yet
+            try:
+                chars.append(json.loads(f'"{escape}"'))
+            except json.JSONDecodeError:
+                pass
+            i += len(escape)
+            continue
+        chars.append(char)
+        i += 1
+    return "".join(chars)
 
 
-def response_generator(prompt: str):
-    """Generate AI response with loading status and proper parsing."""
-    import json
+def _encoding_field(chart_spec: dict, channel: str):
+    encoding = (chart_spec.get("encoding") or {}).get(channel) or {}
+    return encoding.get("field"), encoding.get("type")
 
-    with st.status("🔍 Analyzing your question...", expanded=True) as status:
-        st.write("🤖 AI agent is generating response...")
-        response_data = generate_ai_response(prompt)
 
-        if "error" in response_data:
-            status.update(label="❌ Error occurred", state="error")
-            st.error(f"Failed to get response: {response_data['error']}")
-            return "Sorry, I encountered an error while processing your request."
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def downsample_chart_spec(chart_spec: dict, max_points: int = MAX_CHART_POINTS) -> dict:
+    """Bound the inline data of a chart so long histories stay cheap to resend.
+
+    Category charts keep the largest `max_points - 1` bars and fold the rest
+    into "Other"; ordered (temporal/quantitative) x axes keep the min and max
+    row of each bucket so peaks and dips survive.
+    """
+    values = (chart_spec.get("data") or {}).get("values")
+    if not isinstance(values, list) or len(values) <= max_points or max_points < 2:
+        return chart_spec
+    x_field, x_type = _encoding_field(chart_spec, "x")
+    y_field, _ = _encoding_field(chart_spec, "y")
+    if not x_field or not y_field:
+        return chart_spec
+
+    if x_type in ("nominal", "ordinal", None):
+        ranked = sorted(values, key=lambda row: _number(row.get(y_field)), reverse=True)
+        kept = ranked[:max_points - 1]
+        other = sum(_number(row.get(y_field)) for row in ranked[max_points - 1:])
+        reduced = kept + [{x_field: "Other", y_field: round(other, 2)}]
+    else:
+        bucket_size = -(-len(values) // (max_points // 2))
+        reduced = []
+        for start in range(0, len(values), bucket_size):
+            bucket = values[start:start + bucket_size]
+            low = min(bucket, key=lambda row: _number(row.get(y_field)))
+            high = max(bucket, key=lambda row: _number(row.get(y_field)))
+            reduced.extend(row for row in bucket if row is low or row is high)
+
+    return {**chart_spec, "data": {**chart_spec["data"], "values": reduced}}
+
+
+def render_message(index: int, message: dict, draw_chart: bool):
+    """Render one stored chat message; charts of older answers are drawn on demand."""
+    with st.chat_message(message["role"]):
+        content = message["content"]
+        if not isinstance(content, dict):
+            st.markdown(content)
+            return
+        chart_spec = content.get("chart_spec")
+        if chart_spec and (draw_chart or st.toggle("📊 Show chart", key=f"show_chart_{index}")):
+            try:
+                st.vega_lite_chart(chart_spec)
+            except Exception as e:
+                st.error(f"Error displaying saved chart: {e}")
+
+        content_text = content.get("content", "")
+        if content_text:
+            st.markdown(content_text)
+
+
+def render_history(messages: list):
+    """Render the last pages of the transcript instead of the whole history."""
+    visible = st.session_state.get("history_visible", HISTORY_PAGE_SIZE)
+    hidden = max(0, len(messages) - visible)
+    if hidden and st.button(f"Show earlier messages ({hidden} hidden)"):
+        st.session_state.history_visible = visible + HISTORY_PAGE_SIZE
+        st.rerun()
+
+    chart_indexes = [
+        index for index, message in enumerate(messages)
+        if isinstance(message["content"], dict) and message["content"].get("chart_spec")
+    ]
+    live_charts = set(chart_indexes[-LIVE_CHART_COUNT:]) if LIVE_CHART_COUNT > 0 else set()
+    for index in range(hidden, len(messages)):
+        render_message(index, messages[index], index in live_charts)
+
+
+def render_function_call(index: int, func_call: dict):
+    """Show one database operation in its own expander."""
+    with st.expander(f"Query {index}: {func_call.get('name', 'unknown')}", expanded=False):
+        args = func_call.get("args", {})
+        if args:
+            for key, value in args.items():
+                st.text(f"{key}: {value}")
+        else:
+            st.text("No parameters")
 
-        st.write("📊 Processing database queries...")
 
-        response_array = response_data if isinstance(
-            response_data, list) else []
+def response_generator(prompt: str):
+    """Stream the AI response, rendering tool calls and the summary as they arrive."""
+    with st.status("🔍 Analyzing your question...", expanded=True) as status:
+        st.write("🤖 AI agent is generating response...")
+        operations_header = st.empty()
+        operations = st.container()
+        summary_placeholder = st.empty()
 
-        function_calls = []
+        function_call_count = 0
+        presenter_text = ""
         final_response = None
 
-        for item in response_array:
-            if "content" in item and "parts" in item["content"]:
-                for part in item["content"]["parts"]:
-                    if "functionCall" in part:
-                        func_call = part["functionCall"]
-                        function_calls.append({
-                            "name": func_call.get("name", "unknown"),
-                            "args": func_call.get("args", {})
-                        })
-
-            if item.get("author") == "presenter_agent" and "content" in item:
-                for part in item["content"]["parts"]:
-                    if "text" in part:
-                        try:
-                            final_response = json.loads(part["text"])
-                        except json.JSONDecodeError:
-                            pass
-
-        if function_calls:
-            st.write("🛠️ **Database Operations:**")
-            for i, func in enumerate(function_calls, 1):
-                with st.expander(f"Query {i}: {func['name']}", expanded=False):
-                    if func['args']:
-                        for key, value in func['args'].items():
-                            st.text(f"{key}: {value}")
-                    else:
-                        st.text("No parameters")
+        try:
+            for event in stream_ai_response(prompt):
+                parts = (event.get("content") or {}).get("parts") or []
+                is_partial = event.get("partial", False)
+
+                if not is_partial:
+                    for part in parts:
+                        if "functionCall" in part:
+                            if function_call_count == 0:
+                                operations_header.write(
+                                    "🛠️ **Database Operations:**")
+                            function_call_count += 1
+                            with operations:
+                                render_function_call(
+                                    function_call_count, part["functionCall"])
+
+                # Cached answers are emitted by the root agent itself
+                if event.get("author") not in ("presenter_agent", "corporate_agent"):
+                    continue
+                text = "".join(part.get("text", "") for part in parts)
+                if is_partial:
+                    presenter_text += text
+                    summary = extract_partial_json_string(
+                        presenter_text, "summary_text")
+                    if summary:
+                        summary_placeholder.markdown(summary)
+                elif text:
+                    try:
+                        final_response = json.loads(text)
+                    except json.JSONDecodeError:
+                        pass
+        except (requests.RequestException, RuntimeError, ValueError) as e:
+            status.update(label="❌ Error occurred", state="error")
+            st.error(f"Failed to get response: {e}")
+            return "Sorry, I encountered an error while processing your request."
 
+        summary_placeholder.empty()
         status.update(label="✅ Analysis complete", state="complete")
 
     if final_response:
@@ -160,7 +336,6 @@ def response_generator(prompt: str):
 
         if response_type == "visual" and vega_lite_spec:
             try:
-                import json
                 if isinstance(vega_lite_spec, str):
                     chart_spec = json.loads(vega_lite_spec)
                 else:
@@ -184,6 +359,7 @@ def response_generator(prompt: str):
                 if 'encoding' in chart_spec and isinstance(chart_spec['encoding'], str):
                     chart_spec['encoding'] = json.loads(chart_spec['encoding'])
 
+                chart_spec = downsample_chart_spec(chart_spec)
                 st.vega_lite_chart(chart_spec)
                 return {
                     "content": f"📊 **Chart Summary**\n\n{summary_text}",
@@ -221,23 +397,7 @@ if "messages" not in st.session_state:
         {"role": "assistant", "content": "Hello there 👋, how can I help you today?"}
     ]
 
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        content = message["content"]
-        if isinstance(content, dict):
-            chart_spec = content.get("chart_spec")
-            if chart_spec:
-                try:
-                    st.vega_lite_chart(chart_spec)
-                except Exception as e:
-                    st.error(f"Error displaying saved chart: {e}")
-
-            content_text = content.get("content", "")
-            if content_text:
-                st.markdown(content_text)
-
-        else:
-            st.markdown(content)
+render_history(st.session_state.messages)
 
 
 if prompt := st.chat_input("What do you want to know?"):
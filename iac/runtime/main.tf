@@ -125,6 +125,15 @@ module "ai_agent_service" {
     ports = [{
       container_port = 8080
     }]
+    # Warm the toolset, schema and data version before the instance takes traffic
+    startup_probe = {
+      timeout_seconds   = 10
+      period_seconds    = 10
+      failure_threshold = 12
+      http_get = {
+        path = "/ready"
+      }
+    }
     resources = {
       limits = {
         cpu    = "2000m"
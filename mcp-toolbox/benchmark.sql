@@ -0,0 +1,127 @@
+-- Per-tool benchmark: original base-table statements vs. the rollup statements
+-- now used in tools.yaml. Run against a local database loaded with init.sql:
+--
+--   psql -h localhost -U mcpuser -d mcpdb -f mcp-toolbox/benchmark.sql
+--
+-- Each pair prints EXPLAIN ANALYZE output; compare the "Execution Time" lines.
+-- The seed data is tiny, so load a larger data set first for meaningful numbers.
+
+\set start_date '2024-01-01'
+\set end_date '2024-12-31'
+\set limit_count 5
+
+SELECT COUNT(*) AS sales_rows FROM sales;
+SELECT COUNT(*) AS sales_daily_rollup_rows FROM sales_daily_rollup;
+SELECT COUNT(*) AS customer_daily_rollup_rows FROM customer_daily_rollup;
+
+-- Warm the cache so both variants are measured hot
+SELECT COUNT(*) FROM sales s JOIN products p ON s.product_id = p.id JOIN customers c ON s.customer_id = c.id;
+
+\echo '=== get-sales-kpis: base tables ==='
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT
+  SUM(s.total_amount) as total_revenue,
+  SUM(s.quantity) as total_units_sold,
+  SUM(s.quantity * (p.price - p.cost)) as total_profit
+FROM sales s
+JOIN products p ON s.product_id = p.id
+WHERE s.sale_date BETWEEN CAST(:'start_date' AS DATE) AND CAST(:'end_date' AS DATE);
+
+\echo '=== get-sales-kpis: rollup ==='
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT
+  SUM(r.revenue) as total_revenue,
+  SUM(r.units_sold)::bigint as total_units_sold,
+  SUM(r.profit) as total_profit
+FROM sales_daily_rollup r
+WHERE r.sale_date BETWEEN CAST(:'start_date' AS DATE) AND CAST(:'end_date' AS DATE);
+
+\echo '=== get-monthly-sales-trend: base tables ==='
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT
+  TO_CHAR(sale_date, 'YYYY-MM') as month_str,
+  SUM(total_amount) as revenue
+FROM sales
+WHERE sale_date BETWEEN CAST(:'start_date' AS DATE) AND CAST(:'end_date' AS DATE)
+GROUP BY month_str
+ORDER BY month_str ASC;
+
+\echo '=== get-monthly-sales-trend: rollup ==='
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT
+  TO_CHAR(sale_date, 'YYYY-MM') as month_str,
+  SUM(revenue) as revenue
+FROM sales_daily_rollup
+WHERE sale_date BETWEEN CAST(:'start_date' AS DATE) AND CAST(:'end_date' AS DATE)
+GROUP BY month_str
+ORDER BY month_str ASC;
+
+\echo '=== get-sales-by-category: base tables ==='
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT
+  p.category,
+  SUM(s.total_amount) as revenue,
+  COUNT(s.id) as transaction_count
+FROM sales s
+JOIN products p ON s.product_id = p.id
+WHERE s.sale_date BETWEEN CAST(:'start_date' AS DATE) AND CAST(:'end_date' AS DATE)
+GROUP BY p.category
+ORDER BY revenue DESC;
+
+\echo '=== get-sales-by-category: rollup ==='
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT
+  r.category,
+  SUM(r.revenue) as revenue,
+  SUM(r.transaction_count)::bigint as transaction_count
+FROM sales_daily_rollup r
+WHERE r.sale_date BETWEEN CAST(:'start_date' AS DATE) AND CAST(:'end_date' AS DATE)
+GROUP BY r.category
+ORDER BY revenue DESC;
+
+\echo '=== get-sales-by-region: base tables ==='
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT
+  c.region,
+  SUM(s.total_amount) as revenue
+FROM sales s
+JOIN customers c ON s.customer_id = c.id
+WHERE s.sale_date BETWEEN CAST(:'start_date' AS DATE) AND CAST(:'end_date' AS DATE)
+GROUP BY c.region
+ORDER BY revenue DESC;
+
+\echo '=== get-sales-by-region: rollup ==='
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT
+  r.region,
+  SUM(r.revenue) as revenue
+FROM sales_daily_rollup r
+WHERE r.sale_date BETWEEN CAST(:'start_date' AS DATE) AND CAST(:'end_date' AS DATE)
+GROUP BY r.region
+ORDER BY revenue DESC;
+
+\echo '=== get-top-customers: base tables ==='
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT
+  c.company_name,
+  c.tier,
+  SUM(s.total_amount) as total_spend
+FROM sales s
+JOIN customers c ON s.customer_id = c.id
+WHERE s.sale_date BETWEEN CAST(:'start_date' AS DATE) AND CAST(:'end_date' AS DATE)
+GROUP BY c.company_name, c.tier
+ORDER BY total_spend DESC
+LIMIT CAST(:'limit_count' AS INT);
+
+\echo '=== get-top-customers: rollup ==='
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT
+  c.company_name,
+  c.tier,
+  SUM(r.revenue) as total_spend
+FROM customer_daily_rollup r
+JOIN customers c ON r.customer_id = c.id
+WHERE r.sale_date BETWEEN CAST(:'start_date' AS DATE) AND CAST(:'end_date' AS DATE)
+GROUP BY c.company_name, c.tier
+ORDER BY total_spend DESC
+LIMIT CAST(:'limit_count' AS INT);
@@ -6,11 +6,21 @@
 -- ORDER BY rolname;
 
 -- 1. CLEANUP (Idempotent: Safe to run multiple times)
+DROP TABLE IF EXISTS sales_daily_rollup;
+DROP TABLE IF EXISTS customer_daily_rollup;
 DROP TABLE IF EXISTS sales;
 DROP TABLE IF EXISTS products;
 DROP TABLE IF EXISTS customers;
+DROP FUNCTION IF EXISTS sales_rollup_apply();
+DROP FUNCTION IF EXISTS sales_rollup_rebuild();
+DROP FUNCTION IF EXISTS products_rollup_regroup();
+DROP FUNCTION IF EXISTS customers_rollup_regroup();
+DROP FUNCTION IF EXISTS refresh_sales_rollups();
 
 -- 2. SCHEMA DEFINITION
+-- Trigram matching for the name searches (search-products, search-customers)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 CREATE TABLE products (
     id SERIAL PRIMARY KEY,
     name VARCHAR(100),
@@ -121,6 +131,242 @@ SELECT
 FROM generate_series(1, 70);
 
 
+-- 7. INDEXES
+-- Every reporting tool filters sales by date and joins on products/customers
+CREATE INDEX sales_sale_date_idx ON sales (sale_date);
+CREATE INDEX sales_customer_id_idx ON sales (customer_id);
+CREATE INDEX sales_product_id_idx ON sales (product_id);
+-- GiST trigram indexes serve the name searches: substring matches (ILIKE
+-- '%term%') come out nearest first (<<->), so the search stops at its LIMIT,
+-- and the fuzzy fallback (%) for typos uses the same index
+CREATE INDEX products_name_trgm_idx ON products USING GIST (name gist_trgm_ops);
+CREATE INDEX customers_company_name_trgm_idx ON customers USING GIST (company_name gist_trgm_ops);
+
+-- 8. ROLLUPS
+-- Daily totals per product category and customer region, and daily spend per
+-- customer. The reporting tools in tools.yaml read these instead of scanning
+-- and joining sales. Statement-level triggers keep them in step with every
+-- write to sales, so a bulk INSERT ... SELECT touches each rollup row once.
+CREATE TABLE sales_daily_rollup (
+    sale_date DATE NOT NULL,
+    category VARCHAR(50),
+    region VARCHAR(50),
+    revenue DECIMAL(16, 2) NOT NULL,
+    units_sold BIGINT NOT NULL,
+    profit DECIMAL(16, 2) NOT NULL,
+    transaction_count BIGINT NOT NULL,
+    UNIQUE NULLS NOT DISTINCT (sale_date, category, region)
+);
+
+CREATE TABLE customer_daily_rollup (
+    sale_date DATE NOT NULL,
+    customer_id INT NOT NULL,
+    revenue DECIMAL(16, 2) NOT NULL,
+    transaction_count BIGINT NOT NULL,
+    PRIMARY KEY (sale_date, customer_id)
+);
+
+CREATE INDEX customer_daily_rollup_customer_id_idx ON customer_daily_rollup (customer_id);
+
+-- Full rebuild from sales. Runs automatically on TRUNCATE sales; call it by hand
+-- after loading sales with triggers disabled (ALTER TABLE sales DISABLE TRIGGER USER).
+-- TRUNCATE locks the rollups, so reporting queries wait until it commits.
+CREATE FUNCTION refresh_sales_rollups() RETURNS void LANGUAGE plpgsql AS $$
+BEGIN
+    TRUNCATE sales_daily_rollup, customer_daily_rollup;
+
+    INSERT INTO sales_daily_rollup
+    SELECT
+        s.sale_date,
+        p.category,
+        c.region,
+        COALESCE(SUM(s.total_amount), 0),
+        COALESCE(SUM(s.quantity), 0),
+        COALESCE(SUM(s.quantity * (p.price - p.cost)), 0),
+        COUNT(*)
+    FROM sales s
+    LEFT JOIN products p ON s.product_id = p.id
+    LEFT JOIN customers c ON s.customer_id = c.id
+    WHERE s.sale_date IS NOT NULL
+    GROUP BY s.sale_date, p.category, c.region;
+
+    INSERT INTO customer_daily_rollup
+    SELECT s.sale_date, s.customer_id, COALESCE(SUM(s.total_amount), 0), COUNT(*)
+    FROM sales s
+    WHERE s.sale_date IS NOT NULL AND s.customer_id IS NOT NULL
+    GROUP BY s.sale_date, s.customer_id;
+
+    ANALYZE sales_daily_rollup;
+    ANALYZE customer_daily_rollup;
+END;
+$$;
+
+-- Incremental maintenance: fold the rows written by one statement into the
+-- rollups (+1 for new rows, -1 for old rows) and drop groups that emptied out.
+CREATE FUNCTION sales_rollup_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    delta TEXT;
+BEGIN
+    delta := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT n.*, 1 AS sign FROM new_sales n'
+        WHEN 'DELETE' THEN 'SELECT o.*, -1 AS sign FROM old_sales o'
+        ELSE 'SELECT n.*, 1 AS sign FROM new_sales n UNION ALL SELECT o.*, -1 AS sign FROM old_sales o'
+    END;
+
+    EXECUTE format($sql$
+        INSERT INTO sales_daily_rollup AS r
+        SELECT
+            d.sale_date,
+            p.category,
+            c.region,
+            COALESCE(SUM(d.sign * d.total_amount), 0),
+            COALESCE(SUM(d.sign * d.quantity), 0),
+            COALESCE(SUM(d.sign * d.quantity * (p.price - p.cost)), 0),
+            SUM(d.sign)
+        FROM (%s) d
+        LEFT JOIN products p ON d.product_id = p.id
+        LEFT JOIN customers c ON d.customer_id = c.id
+        WHERE d.sale_date IS NOT NULL
+        GROUP BY d.sale_date, p.category, c.region
+        ON CONFLICT (sale_date, category, region) DO UPDATE SET
+            revenue = r.revenue + EXCLUDED.revenue,
+            units_sold = r.units_sold + EXCLUDED.units_sold,
+            profit = r.profit + EXCLUDED.profit,
+            transaction_count = r.transaction_count + EXCLUDED.transaction_count
+    $sql$, delta);
+
+    EXECUTE format($sql$
+        INSERT INTO customer_daily_rollup AS r
+        SELECT d.sale_date, d.customer_id, COALESCE(SUM(d.sign * d.total_amount), 0), SUM(d.sign)
+        FROM (%s) d
+        WHERE d.sale_date IS NOT NULL AND d.customer_id IS NOT NULL
+        GROUP BY d.sale_date, d.customer_id
+        ON CONFLICT (sale_date, customer_id) DO UPDATE SET
+            revenue = r.revenue + EXCLUDED.revenue,
+            transaction_count = r.transaction_count + EXCLUDED.transaction_count
+    $sql$, delta);
+
+    IF TG_OP <> 'INSERT' THEN
+        DELETE FROM sales_daily_rollup WHERE transaction_count <= 0;
+        DELETE FROM customer_daily_rollup WHERE transaction_count <= 0;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE FUNCTION sales_rollup_rebuild() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM refresh_sales_rollups();
+    RETURN NULL;
+END;
+$$;
+
+-- A product's category, price or cost feeds sales_daily_rollup. Move the sales
+-- of the products whose values changed from their old group (-1) to their new
+-- one (+1); only those rollup rows are written, and nothing is locked beyond them.
+CREATE FUNCTION products_rollup_regroup() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO sales_daily_rollup AS r
+    SELECT
+        d.sale_date,
+        d.category,
+        c.region,
+        SUM(d.sign * d.total_amount),
+        SUM(d.sign * d.quantity),
+        COALESCE(SUM(d.sign * d.quantity * (d.price - d.cost)), 0),
+        SUM(d.sign)
+    FROM (
+        SELECT s.sale_date, s.customer_id, s.quantity, s.total_amount, x.category, x.price, x.cost, x.sign
+        FROM (
+            SELECT o.id, o.category, o.price, o.cost, -1 AS sign
+            FROM old_products o JOIN new_products n ON o.id = n.id
+            WHERE (o.category, o.price, o.cost) IS DISTINCT FROM (n.category, n.price, n.cost)
+            UNION ALL
+            SELECT n.id, n.category, n.price, n.cost, 1
+            FROM old_products o JOIN new_products n ON o.id = n.id
+            WHERE (o.category, o.price, o.cost) IS DISTINCT FROM (n.category, n.price, n.cost)
+        ) x
+        JOIN sales s ON s.product_id = x.id
+        WHERE s.sale_date IS NOT NULL
+    ) d
+    LEFT JOIN customers c ON d.customer_id = c.id
+    GROUP BY d.sale_date, d.category, c.region
+    ON CONFLICT (sale_date, category, region) DO UPDATE SET
+        revenue = r.revenue + EXCLUDED.revenue,
+        units_sold = r.units_sold + EXCLUDED.units_sold,
+        profit = r.profit + EXCLUDED.profit,
+        transaction_count = r.transaction_count + EXCLUDED.transaction_count;
+
+    DELETE FROM sales_daily_rollup WHERE transaction_count <= 0;
+    RETURN NULL;
+END;
+$$;
+
+-- Same for a customer's region; customer_daily_rollup does not depend on it.
+CREATE FUNCTION customers_rollup_regroup() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO sales_daily_rollup AS r
+    SELECT
+        d.sale_date,
+        p.category,
+        d.region,
+        SUM(d.sign * d.total_amount),
+        SUM(d.sign * d.quantity),
+        COALESCE(SUM(d.sign * d.quantity * (p.price - p.cost)), 0),
+        SUM(d.sign)
+    FROM (
+        SELECT s.sale_date, s.product_id, s.quantity, s.total_amount, x.region, x.sign
+        FROM (
+            SELECT o.id, o.region, -1 AS sign
+            FROM old_customers o JOIN new_customers n ON o.id = n.id
+            WHERE o.region IS DISTINCT FROM n.region
+            UNION ALL
+            SELECT n.id, n.region, 1
+            FROM old_customers o JOIN new_customers n ON o.id = n.id
+            WHERE o.region IS DISTINCT FROM n.region
+        ) x
+        JOIN sales s ON s.customer_id = x.id
+        WHERE s.sale_date IS NOT NULL
+    ) d
+    LEFT JOIN products p ON d.product_id = p.id
+    GROUP BY d.sale_date, p.category, d.region
+    ON CONFLICT (sale_date, category, region) DO UPDATE SET
+        revenue = r.revenue + EXCLUDED.revenue,
+        units_sold = r.units_sold + EXCLUDED.units_sold,
+        profit = r.profit + EXCLUDED.profit,
+        transaction_count = r.transaction_count + EXCLUDED.transaction_count;
+
+    DELETE FROM sales_daily_rollup WHERE transaction_count <= 0;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER sales_rollup_insert
+    AFTER INSERT ON sales REFERENCING NEW TABLE AS new_sales
+    FOR EACH STATEMENT EXECUTE FUNCTION sales_rollup_apply();
+CREATE TRIGGER sales_rollup_update
+    AFTER UPDATE ON sales REFERENCING OLD TABLE AS old_sales NEW TABLE AS new_sales
+    FOR EACH STATEMENT EXECUTE FUNCTION sales_rollup_apply();
+CREATE TRIGGER sales_rollup_delete
+    AFTER DELETE ON sales REFERENCING OLD TABLE AS old_sales
+    FOR EACH STATEMENT EXECUTE FUNCTION sales_rollup_apply();
+CREATE TRIGGER sales_rollup_truncate
+    AFTER TRUNCATE ON sales
+    FOR EACH STATEMENT EXECUTE FUNCTION sales_rollup_rebuild();
+-- Deleting a product or customer cannot change the rollups: the foreign keys
+-- on sales reject deleting one that has sales.
+CREATE TRIGGER products_rollup_regroup
+    AFTER UPDATE ON products REFERENCING OLD TABLE AS old_products NEW TABLE AS new_products
+    FOR EACH STATEMENT EXECUTE FUNCTION products_rollup_regroup();
+CREATE TRIGGER customers_rollup_regroup
+    AFTER UPDATE ON customers REFERENCING OLD TABLE AS old_customers NEW TABLE AS new_customers
+    FOR EACH STATEMENT EXECUTE FUNCTION customers_rollup_regroup();
+
+-- Initial build for the seed data above
+SELECT refresh_sales_rollups();
+ANALYZE sales;
+
+
 -- Grant IAM service account/user access to database
 -- Comment out below for production use; adjust as needed for your setup; replace 'mcpuser' with actual service account name
 -- GRANT USAGE ON SCHEMA public TO mcpuser;
@@ -136,3 +382,11 @@ FROM generate_series(1, 70);
 -- GRANT ALL PRIVILEGES
 -- ON TABLE public.customers
 -- TO mcpuser;
+
+-- GRANT ALL PRIVILEGES
+-- ON TABLE public.sales_daily_rollup
+-- TO mcpuser;
+
+-- GRANT ALL PRIVILEGES
+-- ON TABLE public.customer_daily_rollup
+-- TO mcpuser;
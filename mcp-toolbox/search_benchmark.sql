@@ -0,0 +1,92 @@
+-- Name search benchmark at 1M synthetic customers: the previous statement
+-- (ILIKE OR similarity, ranked by a sort over every match, GIN index) vs. the
+-- two-phase statement used in tools.yaml (GiST index, substring matches
+-- nearest first so the scan stops at LIMIT, fuzzy fallback only for typos).
+-- Everything runs against a temporary table, so the real tables are untouched:
+--
+--   psql -h localhost -U mcpuser -d mcpdb -f mcp-toolbox/search_benchmark.sql
+--
+-- Compare the "Execution Time" lines of each pair.
+
+\set customer_count 1000000
+\set exact_term 'Dynamic'
+\set prefix_term 'Cyberdyne Sys'
+\set typo_term 'Cyberdine Systms'
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE TEMP TABLE bench_customers AS
+SELECT
+    n AS id,
+    (ARRAY['Acme', 'Globex', 'Soylent', 'Initech', 'Umbrella', 'Cyberdyne', 'Stark',
+           'Wayne', 'Massive', 'Hooli', 'Vandelay', 'Tyrell', 'Wonka', 'Oscorp'])[1 + n % 14]
+        || ' ' ||
+    (ARRAY['Systems', 'Industries', 'Dynamic', 'Labs', 'Holdings', 'Logistics',
+           'Networks', 'Partners', 'Robotics', 'Foods'])[1 + (n / 14) % 10]
+        || ' ' || to_hex(n * 2654435761 % 4294967296) AS company_name,
+    (ARRAY['North America', 'EMEA', 'APAC'])[1 + n % 3] AS region,
+    (ARRAY['Enterprise', 'SMB', 'Startup'])[1 + n % 3] AS tier
+FROM generate_series(1, :customer_count) AS n;
+
+PREPARE previous_search(text) AS
+SELECT id, company_name, region, tier,
+  ROUND(similarity(company_name, $1)::numeric, 2) as match_score
+FROM bench_customers
+WHERE company_name ILIKE '%' || $1 || '%' OR company_name % $1
+ORDER BY (company_name ILIKE '%' || $1 || '%') DESC, similarity(company_name, $1) DESC, id
+LIMIT 10;
+
+-- Same statement as search-customers in tools.yaml
+PREPARE two_phase_search(text) AS
+WITH substring_matches AS (
+  SELECT id, company_name, region, tier, 1 - ($1 <<-> company_name) AS score
+  FROM bench_customers
+  WHERE company_name ILIKE '%' || $1 || '%'
+  ORDER BY $1 <<-> company_name
+  LIMIT 10
+)
+SELECT id, company_name, region, tier, ROUND(score::numeric, 2) as match_score
+FROM (
+  SELECT *, 0 AS phase FROM substring_matches
+  UNION ALL
+  (SELECT id, company_name, region, tier, similarity(company_name, $1), 1
+   FROM bench_customers
+   WHERE company_name % $1 AND NOT company_name ILIKE '%' || $1 || '%'
+     AND (SELECT count(*) FROM substring_matches) < 10
+   ORDER BY similarity(company_name, $1) DESC, id
+   LIMIT 10)
+) matches
+ORDER BY phase, score DESC, id
+LIMIT 10;
+
+\timing on
+CREATE INDEX bench_customers_company_name_gin_idx
+    ON bench_customers USING GIN (company_name gin_trgm_ops);
+\timing off
+ANALYZE bench_customers;
+
+\echo '=== previous statement, GIN index: exact word ==='
+EXPLAIN (ANALYZE, BUFFERS) EXECUTE previous_search(:'exact_term');
+\echo '=== previous statement, GIN index: name prefix ==='
+EXPLAIN (ANALYZE, BUFFERS) EXECUTE previous_search(:'prefix_term');
+\echo '=== previous statement, GIN index: typo ==='
+EXPLAIN (ANALYZE, BUFFERS) EXECUTE previous_search(:'typo_term');
+
+DROP INDEX bench_customers_company_name_gin_idx;
+\timing on
+CREATE INDEX bench_customers_company_name_gist_idx
+    ON bench_customers USING GIST (company_name gist_trgm_ops);
+\timing off
+ANALYZE bench_customers;
+
+\echo '=== two-phase statement, GiST index: exact word ==='
+EXPLAIN (ANALYZE, BUFFERS) EXECUTE two_phase_search(:'exact_term');
+\echo '=== two-phase statement, GiST index: name prefix ==='
+EXPLAIN (ANALYZE, BUFFERS) EXECUTE two_phase_search(:'prefix_term');
+\echo '=== two-phase statement, GiST index: typo ==='
+EXPLAIN (ANALYZE, BUFFERS) EXECUTE two_phase_search(:'typo_term');
+
+\echo '=== typo resolution: top matches ==='
+EXECUTE two_phase_search(:'typo_term');
+
+DROP TABLE bench_customers;